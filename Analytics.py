@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import heapq
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+from Blockchain import AMOUNT_SCALE, Block, Transaction, TransactionMiner
+
+try:
+    import numpy
+except ImportError:  # the reports fall back to plain loops over the columns
+    numpy = None
+
+# sender id of the mining rewards, they do not take coins from any address
+COINBASE_ID = -1
+
+
+class ChainAnalytics:
+    """class with columnar views of the confirmed transactions for bulk reports, never changed"""
+
+    def __init__(self, blocks: Iterable[Block] = ()) -> None:
+        """constructor method for ChainAnalytics class"""
+        self.__addresses: List[str] = []
+        self.__ids: Dict[str, int] = {}
+        # one row per confirmed transaction, amounts in units of 1 / AMOUNT_SCALE
+        self.__senders: array = array("q")
+        self.__receivers: array = array("q")
+        self.__amounts: array = array("q")
+        self.__heights: array = array("q")
+        self.__length: int = 0
+        self.__extend(blocks)
+
+    def __len__(self) -> int:
+        """method to return the number of confirmed transactions"""
+        return len(self.__amounts)
+
+    @property
+    def addresses(self) -> List[str]:
+        """getter method for the addresses, the position of an address is its id"""
+        return list(self.__addresses)
+
+    @property
+    def columns(self) -> dict:
+        """getter method for copies of the sender, receiver, amount and height columns"""
+        columns = {
+            "sender": self.__senders,
+            "receiver": self.__receivers,
+            "amount": self.__amounts,
+            "height": self.__heights,
+        }
+        if numpy is not None:
+            return {
+                name: numpy.array(column, dtype=numpy.int64) for name, column in columns.items()
+            }
+        return {name: array("q", column) for name, column in columns.items()}
+
+    def __id(self, address: str) -> int:
+        """method to get the id of an address, adding it the first time"""
+        id = self.__ids.get(address)
+        if id is None:
+            id = self.__ids[address] = len(self.__addresses)
+            self.__addresses.append(address)
+        return id
+
+    def extended(self, blocks: Iterable[Block]) -> ChainAnalytics:
+        """method to return new reports with the confirmed transactions of the next blocks added"""
+        analytics = ChainAnalytics()
+        # the columns are copied whole, the blocks already reported are not read again
+        analytics.__addresses = list(self.__addresses)
+        analytics.__ids = dict(self.__ids)
+        analytics.__senders = array("q", self.__senders)
+        analytics.__receivers = array("q", self.__receivers)
+        analytics.__amounts = array("q", self.__amounts)
+        analytics.__heights = array("q", self.__heights)
+        analytics.__length = self.__length
+        analytics.__extend(blocks)
+        return analytics
+
+    def __extend(self, blocks: Iterable[Block]) -> None:
+        """method to add the confirmed transactions of the next blocks of the chain"""
+        for block in blocks:
+            for transaction in block.transactions:
+                if transaction.status != Transaction.Status.CONFIRMED:
+                    continue
+                if isinstance(transaction, TransactionMiner):
+                    self.__senders.append(COINBASE_ID)
+                    self.__receivers.append(self.__id(transaction.miner))
+                    self.__amounts.append(round(transaction.reward * AMOUNT_SCALE))
+                else:
+                    self.__senders.append(self.__id(transaction.sender))
+                    self.__receivers.append(self.__id(transaction.receiver))
+                    self.__amounts.append(round(transaction.amount * AMOUNT_SCALE))
+                self.__heights.append(self.__length)
+            self.__length += 1
+
+    def __vectors(self) -> tuple:
+        """method to get numpy views of the columns without copying them"""
+        return tuple(
+            (
+                numpy.frombuffer(column, dtype=numpy.int64)
+                if len(column)
+                else numpy.zeros(0, numpy.int64)
+            )
+            for column in (self.__senders, self.__receivers, self.__amounts, self.__heights)
+        )
+
+    @staticmethod
+    def __sum_by(keys, amounts, length: int):
+        """method to add up the amounts that share a key, keys go from 0 to length - 1"""
+        # float64 sums of whole units are exact below 2**53, about 90 million coins
+        totals = numpy.bincount(keys, weights=amounts, minlength=length)
+        return totals.round().astype(numpy.int64)
+
+    def __balance_units(self) -> List[int]:
+        """method to get the balance of every address id in units of 1 / AMOUNT_SCALE"""
+        if numpy is not None:
+            senders, receivers, amounts, _ = self.__vectors()
+            # a transfer to the same address takes the amount without giving it back
+            credited = receivers != senders
+            debited = senders != COINBASE_ID
+            credits = self.__sum_by(receivers[credited], amounts[credited], len(self.__ids))
+            debits = self.__sum_by(senders[debited], amounts[debited], len(self.__ids))
+            return (credits - debits).tolist()
+        totals = [0] * len(self.__ids)
+        for sender, receiver, amount in zip(self.__senders, self.__receivers, self.__amounts):
+            if sender != COINBASE_ID:
+                totals[sender] -= amount
+            if receiver != sender:
+                totals[receiver] += amount
+        return totals
+
+    def balances(self) -> Dict[str, float]:
+        """method to get the confirmed balance of every address"""
+        return {
+            address: units / AMOUNT_SCALE
+            for address, units in zip(self.__addresses, self.__balance_units())
+        }
+
+    def rich_list(self, count: int = 10) -> List[Tuple[str, float]]:
+        """method to get the addresses with the highest balances, highest first"""
+        units = self.__balance_units()
+        if numpy is not None and units:
+            vector = numpy.array(units, dtype=numpy.int64)
+            top = numpy.argsort(-vector, kind="stable")[:count].tolist()
+        else:
+            top = heapq.nlargest(count, range(len(units)), key=units.__getitem__)
+        return [(self.__addresses[id], units[id] / AMOUNT_SCALE) for id in top]
+
+    def volume(self) -> List[float]:
+        """method to get the amount transferred between addresses in each block"""
+        if numpy is not None:
+            senders, _, amounts, heights = self.__vectors()
+            transfers = senders != COINBASE_ID
+            totals = self.__sum_by(heights[transfers], amounts[transfers], self.__length).tolist()
+        else:
+            totals = [0] * self.__length
+            for sender, amount, height in zip(self.__senders, self.__amounts, self.__heights):
+                if sender != COINBASE_ID:
+                    totals[height] += amount
+        return [units / AMOUNT_SCALE for units in totals]
+
+    def flows(self, count: int = None) -> List[Tuple[str, str, float]]:
+        """method to get the total sent from each address to each other one, largest first"""
+        if numpy is not None:
+            senders, receivers, amounts, _ = self.__vectors()
+            transfers = senders != COINBASE_ID
+            pairs = senders[transfers] * len(self.__ids) + receivers[transfers]
+            keys, positions = numpy.unique(pairs, return_inverse=True)
+            totals = self.__sum_by(positions.ravel(), amounts[transfers], len(keys))
+            top = numpy.argsort(-totals, kind="stable")[:count]
+            ranked = [
+                (divmod(key, len(self.__ids)), units)
+                for key, units in zip(keys[top].tolist(), totals[top].tolist())
+            ]
+        else:
+            flows: Dict[Tuple[int, int], int] = {}
+            for sender, receiver, amount in zip(self.__senders, self.__receivers, self.__amounts):
+                if sender != COINBASE_ID:
+                    flows[sender, receiver] = flows.get((sender, receiver), 0) + amount
+            ranked = sorted(flows.items(), key=lambda item: item[1], reverse=True)[:count]
+        return [
+            (self.__addresses[sender], self.__addresses[receiver], units / AMOUNT_SCALE)
+            for (sender, receiver), units in ranked
+        ]
@@ -3,50 +3,207 @@ from __future__ import annotations
 import datetime
 import hashlib
 import json
+import os
+import struct
+import sys
 import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import List
+from bisect import bisect_left, bisect_right
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Mapping, Set, Tuple
 
 # cspell: disable-next-line
 from ecdsa import SECP256k1, SigningKey
+from Mining import NONCE_SIZE, MiningEngine
+from Signatures import SignatureVerifier, sign, verify_signature
+
+if TYPE_CHECKING:
+    from Storage import BlockStore, SnapshotStore
+
+BLOCK_VERSION = 2
+DIFFICULTY = 4
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+# amounts are hashed as fixed-width integers of 1e-8 coins so 2 and 2.0 hash the same
+AMOUNT_SCALE = 10**8
+EPOCH = datetime.datetime(1970, 1, 1)
+# how many validated blocks are remembered, side branches included
+VALIDATED_CACHE_SIZE = 10_000
+# how many received blocks are kept while their parent is missing
+ORPHAN_CACHE_SIZE = 100
+# with several cores, chains with at least this many unknown blocks are checked in a pool
+PARALLEL_VALIDATION_THRESHOLD = 500
+VALIDATION_CHUNK_SIZE = 64
+# version, previous hash, merkle root, timestamp, difficulty, nonce
+HEADER_FORMAT = ">I32s32sqIQ"
+# how many blocks are added between two snapshots of the state
+SNAPSHOT_INTERVAL = 100
+# limits of the mempool in transactions and in serialized bytes
+MEMPOOL_MAX_COUNT = 10_000
+MEMPOOL_MAX_BYTES = 2_000_000
+# transactions of an address history in a page by default and at most
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_timestamp(timestamp: str) -> datetime.datetime:
+    """function to parse a timestamp in TIMESTAMP_FORMAT, much faster than strptime"""
+    return datetime.datetime.fromisoformat(timestamp)
+
+
+def timestamp_to_int(timestamp: datetime.datetime) -> int:
+    """function to convert a timestamp to microseconds since the epoch"""
+    return (timestamp - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def format_timestamp(microseconds: int) -> str:
+    """function to format microseconds since the epoch in TIMESTAMP_FORMAT"""
+    timestamp = (EPOCH + datetime.timedelta(microseconds=microseconds)).isoformat(" ")
+    # isoformat leaves out the microseconds when they are zero, strftime does not
+    return timestamp if microseconds % 1_000_000 else timestamp + ".000000"
+
+
+def proof_work(version: int, difficulty: int, genesis: bool = False) -> int:
+    """function to get the expected hashes behind a block, 1 for blocks without a proof of work"""
+    if version < 2 or genesis:
+        return 1
+    return 16**difficulty
+
+
+def first_invalid_block(blocks: List[dict]) -> int:
+    """function to return the index of the first block whose hash does not match, or -1"""
+    for i, block in enumerate(blocks):
+        if not Blockchain.is_hash_valid(block):
+            return i
+    return -1
 
 
 class Transaction(ABC):
     """class for transactions"""
 
+    # slots leave out the per-instance dictionary, chains hold millions of transactions
+    __slots__ = ("__digest",)
+
     class Status(Enum):
         """enumeration for transaction status"""
 
         PENDING = "PENDING"
         CONFIRMED = "CONFIRMED"
 
+    class Type(Enum):
+        """enumeration for transaction type"""
+
+        USER = 0
+        MINER = 1
+
+    def __init__(self) -> None:
+        """constructor method for Transaction class"""
+        self.__digest: bytes = None
+
+    def rehash(self) -> None:
+        """method to calculate the hash again once the serialized data changed"""
+        self.__digest = None
+
+    @property
+    def digest(self) -> bytes:
+        """getter method for the hash of the serialized data, it is calculated once"""
+        if self.__digest is None:
+            self.__digest = hashlib.sha256(self.serialize()).digest()
+        return self.__digest
+
+    @property
+    def id(self) -> str:
+        """getter method for the transaction id, the hex digest of its serialized data"""
+        return self.digest.hex()
+
     @abstractmethod
     def change_status(self, status: Status) -> None:
         """method to change the status of the transaction"""
         pass
 
+    @abstractmethod
+    def serialize(self) -> bytes:
+        """method to return the canonical bytes of the transaction, without its status"""
+        pass
+
     @abstractmethod
     def to_dict(self) -> dict:
         """method to return a dictionary with the transaction data"""
         pass
 
+    @staticmethod
+    def pack(
+        type: Transaction.Type,
+        amount: float,
+        sender: str,
+        receiver: str,
+        timestamp: int,
+    ) -> bytes:
+        """method to pack the fields of a transaction into bytes, timestamp in microseconds"""
+        sender = sender.encode()
+        receiver = receiver.encode()
+        return (
+            struct.pack(
+                ">Bqq",
+                type.value,
+                round(amount * AMOUNT_SCALE),
+                timestamp or 0,
+            )
+            + struct.pack(">H", len(sender))
+            + sender
+            + struct.pack(">H", len(receiver))
+            + receiver
+        )
+
+    @staticmethod
+    def from_dict(data: dict) -> Transaction:
+        """method to create a transaction from a dictionary"""
+        status = (
+            Transaction.Status.CONFIRMED
+            if data["status"] == "CONFIRMED"
+            else Transaction.Status.PENDING
+        )
+        timestamp = parse_timestamp(data["timestamp"]) if data.get("timestamp") else None
+        if data["sender"] == "ITcoin":
+            return TransactionMiner(data["amount"], data["receiver"], status, timestamp)
+        return TransactionUser(
+            data["amount"],
+            data["sender"],
+            data["receiver"],
+            status,
+            timestamp,
+            data.get("signature"),
+        )
+
 
 class TransactionUser(Transaction):
     """class for transactions made by users"""
 
+    __slots__ = ("__amount", "__sender", "__receiver", "__status", "__timestamp", "__signature")
+
     def __init__(
         self,
         amount: float,
         sender: str,
         receiver: str,
         status: Transaction.Status = Transaction.Status.PENDING,
+        timestamp: datetime.datetime = None,
+        signature: str = None,
     ) -> None:
         """constructor method for TransactionUser class"""
+        super().__init__()
         self.__amount: float = amount
-        self.__sender: str = sender
-        self.__receiver: str = receiver
+        # interned keys are shared by every transaction of the same address
+        self.__sender: str = sys.intern(sender)
+        self.__receiver: str = sys.intern(receiver)
         self.__status: Transaction.Status = status
+        # microseconds since the epoch take less memory than a datetime
+        self.__timestamp: int = timestamp_to_int(timestamp) if timestamp else None
+        self.__signature: str = signature
 
     @property
     def amount(self) -> float:
@@ -68,10 +225,44 @@ class TransactionUser(Transaction):
         """getter method for status"""
         return self.__status
 
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """getter method for timestamp"""
+        if self.__timestamp is None:
+            return None
+        return EPOCH + datetime.timedelta(microseconds=self.__timestamp)
+
+    @property
+    def signature(self) -> str:
+        """getter method for the signature of the sender over the serialized data"""
+        return self.__signature
+
     def change_status(self, status: Transaction.Status) -> None:
         """method to change the status of the transaction"""
         self.__status = status
 
+    def sign(self, signing_key: SigningKey) -> None:
+        """method to sign the transaction with the private key of the sender"""
+        self.__signature = sign(signing_key, self.message())
+        # the signature is part of the id
+        self.rehash()
+
+    def verify(self) -> bool:
+        """method to check that the signature belongs to the sender"""
+        return verify_signature(self.__sender, self.__signature, self.message())
+
+    def message(self) -> bytes:
+        """method to return the bytes the sender signs, the serialized data without the signature"""
+        return self.pack(
+            Transaction.Type.USER, self.__amount, self.__sender, self.__receiver, self.__timestamp
+        )
+
+    def serialize(self) -> bytes:
+        """method to return the canonical bytes of the transaction, without its status"""
+        # a copy with another signature has another id, block hash and merkle root
+        signature = self.__signature.encode() if self.__signature else b""
+        return self.message() + struct.pack(">H", len(signature)) + signature
+
     def to_dict(self) -> dict:
         """method to return a dictionary with the transaction data"""
         return {
@@ -79,20 +270,33 @@ class TransactionUser(Transaction):
             "sender": self.sender,
             "receiver": self.receiver,
             "status": self.status.value,
+            "timestamp": (
+                format_timestamp(self.__timestamp) if self.__timestamp is not None else None
+            ),
+            "signature": self.__signature,
         }
 
 
 class TransactionMiner(Transaction):
     """class for transactions made by miners"""
 
+    __slots__ = ("__reward", "__miner", "__status", "__timestamp")
+    __coinbase: str = "ITcoin"
+
     def __init__(
-        self, amount: float, miner: str, status: Transaction.Status = Transaction.Status.PENDING
+        self,
+        amount: float,
+        miner: str,
+        status: Transaction.Status = Transaction.Status.PENDING,
+        timestamp: datetime.datetime = None,
     ) -> None:
         """constructor method for TransactionMiner class"""
+        super().__init__()
         self.__reward: float = amount
-        self.__miner: str = miner
-        self.__coinbase = "ITcoin"
+        self.__miner: str = sys.intern(miner)
         self.__status: Transaction.Status = status
+        # microseconds since the epoch take less memory than a datetime
+        self.__timestamp: int = timestamp_to_int(timestamp) if timestamp else None
 
     @property
     def reward(self) -> float:
@@ -114,10 +318,23 @@ class TransactionMiner(Transaction):
         """getter method for status"""
         return self.__status
 
+    @property
+    def timestamp(self) -> datetime.datetime:
+        """getter method for timestamp"""
+        if self.__timestamp is None:
+            return None
+        return EPOCH + datetime.timedelta(microseconds=self.__timestamp)
+
     def change_status(self, status: Transaction.Status) -> None:
         """method to change the status of the transaction"""
         self.__status = status
 
+    def serialize(self) -> bytes:
+        """method to return the canonical bytes of the transaction, without its status"""
+        return self.pack(
+            Transaction.Type.MINER, self.__reward, self.__coinbase, self.__miner, self.__timestamp
+        )
+
     def to_dict(self) -> dict:
         """method to return a dictionary with the transaction data"""
         return {
@@ -125,12 +342,378 @@ class TransactionMiner(Transaction):
             "sender": self.coinbase,
             "receiver": self.miner,
             "status": self.status.value,
+            "timestamp": (
+                format_timestamp(self.__timestamp) if self.__timestamp is not None else None
+            ),
         }
 
 
+class MempoolView(Sequence):
+    """class for the dictionaries or ids of the pending transactions at one moment, never changed"""
+
+    __slots__ = ("__rewards", "__items", "__start", "__end")
+
+    def __init__(
+        self, rewards: tuple = (), items: list = None, start: int = 0, end: int = 0
+    ) -> None:
+        """constructor method for MempoolView class, it sees items from start to end"""
+        self.__rewards: tuple = rewards
+        # the list is shared with the views made after this one, they only add past end
+        self.__items: list = items if items is not None else []
+        self.__start: int = start
+        self.__end: int = end
+
+    def __len__(self) -> int:
+        """method to return the number of transactions"""
+        return len(self.__rewards) + self.__end - self.__start
+
+    def __getitem__(self, index):
+        """method to get a transaction by position, rewards first"""
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("mempool index out of range")
+        if index < len(self.__rewards):
+            return self.__rewards[index]
+        return self.__items[self.__start + index - len(self.__rewards)]
+
+    def __iter__(self) -> Iterator:
+        """method to iterate the transactions, rewards first and then by arrival"""
+        yield from self.__rewards
+        for index in range(self.__start, self.__end):
+            yield self.__items[index]
+
+    def append(self, transaction) -> MempoolView:
+        """method to return a view with one more user transaction at the end"""
+        items, start, end = self.__items, self.__start, self.__end
+        if end != len(items):
+            # a view made from this one already added past end, so the list is copied
+            items, start, end = items[start:end], 0, end - start
+        items.append(transaction)
+        return MempoolView(self.__rewards, items, start, end + 1)
+
+    def drop_first(self) -> MempoolView:
+        """method to return a view without its oldest user transaction"""
+        items, start, end = self.__items, self.__start + 1, self.__end
+        # the dropped transactions are released once they are most of the list
+        if start > end - start:
+            items, start, end = items[start:end], 0, end - start
+        return MempoolView(self.__rewards, items, start, end)
+
+
+class BalanceLog:
+    """class for the values a balance index had in each state version, for readers of old states"""
+
+    def __init__(self) -> None:
+        """constructor method for BalanceLog class"""
+        # versions and values of each address in the order they were recorded
+        self.__entries: Dict[str, Tuple[List[int], List[float]]] = {}
+        self.__size: int = 0
+
+    def __len__(self) -> int:
+        """method to return the number of recorded values"""
+        return self.__size
+
+    def record(self, address: str, value: float, version: int) -> None:
+        """method to record the value of an address from a version on"""
+        versions, values = self.__entries.setdefault(address, ([], []))
+        # the value goes first, a reader that finds the version always finds its value
+        values.append(value)
+        versions.append(version)
+        self.__size += 1
+
+    def get(self, address: str, version: int, default: float = None) -> float:
+        """method to get the value an address had in a version"""
+        entries = self.__entries.get(address)
+        if entries is None:
+            return default
+        index = bisect_right(entries[0], version)
+        return entries[1][index - 1] if index else default
+
+    def addresses(self) -> List[str]:
+        """method to return the recorded addresses"""
+        return list(self.__entries)
+
+
+class BalanceView(Mapping):
+    """class for the balances of a BalanceLog in one version, it is never changed"""
+
+    __slots__ = ("__log", "__version")
+
+    def __init__(self, log: BalanceLog, version: int) -> None:
+        """constructor method for BalanceView class"""
+        self.__log: BalanceLog = log
+        self.__version: int = version
+
+    def __getitem__(self, address: str) -> float:
+        """method to get the balance of an address"""
+        value = self.__log.get(address, self.__version)
+        if value is None:
+            raise KeyError(address)
+        return value
+
+    def get(self, address: str, default: float = None) -> float:
+        """method to get the balance of an address, default if it has none"""
+        return self.__log.get(address, self.__version, default)
+
+    def __iter__(self) -> Iterator[str]:
+        """method to iterate the addresses with a balance"""
+        return (
+            address
+            for address in self.__log.addresses()
+            if self.__log.get(address, self.__version) is not None
+        )
+
+    def __len__(self) -> int:
+        """method to return the number of addresses with a balance"""
+        return sum(1 for _ in self)
+
+
+class Mempool:
+    """class for the pending transactions, indexed by id and bounded in count and size"""
+
+    def __init__(
+        self, max_count: int = MEMPOOL_MAX_COUNT, max_bytes: int = MEMPOOL_MAX_BYTES
+    ) -> None:
+        """constructor method for Mempool class"""
+        self.__max_count: int = max_count
+        self.__max_bytes: int = max_bytes
+        # mining rewards are kept apart so they are never evicted
+        self.__rewards: OrderedDict[str, Transaction] = OrderedDict()
+        # user transactions in arrival order, the oldest are evicted first
+        self.__transactions: OrderedDict[str, Transaction] = OrderedDict()
+        self.__dicts: Dict[str, dict] = {}
+        self.__sizes: Dict[str, int] = {}
+        self.__bytes: int = 0
+        # the dictionaries and ids in order for readers, extended while only user ones arrive
+        self.__view: MempoolView = MempoolView()
+        self.__ids: MempoolView = MempoolView()
+        self.__stale: bool = False
+
+    @property
+    def size(self) -> int:
+        """getter method for the serialized size of the transactions in bytes"""
+        return self.__bytes
+
+    @property
+    def digest(self) -> str:
+        """getter method for a digest of the transaction ids that does not depend on their order"""
+        return self.digest_ids(self.ids)
+
+    @staticmethod
+    def digest_ids(ids: Iterable[str]) -> str:
+        """method to hash transaction ids in sorted order, a set always gives the same hash"""
+        return hashlib.sha256("".join(sorted(ids)).encode()).hexdigest()
+
+    @staticmethod
+    def digest_of(transactions: Iterable[dict]) -> str:
+        """method to calculate the digest of a list of transaction dictionaries"""
+        return Mempool.digest_ids(
+            Transaction.from_dict(transaction).id for transaction in transactions
+        )
+
+    def __len__(self) -> int:
+        """method to return the number of transactions"""
+        return len(self.__rewards) + len(self.__transactions)
+
+    def __contains__(self, id: str) -> bool:
+        """method to check if a transaction id is in the mempool"""
+        return id in self.__dicts
+
+    def get(self, id: str) -> dict:
+        """method to get the dictionary of a transaction by id, None if it is not in the mempool"""
+        return self.__dicts.get(id)
+
+    @property
+    def view(self) -> MempoolView:
+        """getter method for the dictionaries in iteration order, in a view that is never changed"""
+        self.__refresh()
+        return self.__view
+
+    @property
+    def ids(self) -> MempoolView:
+        """getter method for the ids in iteration order, in a view that is never changed"""
+        self.__refresh()
+        return self.__ids
+
+    def __refresh(self) -> None:
+        """method to build the views again after a reward was added or transactions removed"""
+        if self.__stale:
+            rewards = tuple(self.__rewards)
+            items = list(self.__transactions)
+            self.__ids = MempoolView(rewards, items, 0, len(items))
+            self.__view = MempoolView(
+                tuple(map(self.__dicts.get, rewards)),
+                list(map(self.__dicts.get, items)),
+                0,
+                len(items),
+            )
+            self.__stale = False
+
+    def __iter__(self) -> Iterator[Transaction]:
+        """method to iterate the transactions, rewards first and then by arrival"""
+        yield from list(self.__rewards.values())
+        yield from list(self.__transactions.values())
+
+    def add(self, transaction: Transaction) -> List[Transaction]:
+        """method to add a transaction, returns the evicted ones or None if it is a duplicate"""
+        id = transaction.id
+        if id in self.__dicts:
+            return None
+        size = len(transaction.serialize())
+        self.__dicts[id] = transaction.to_dict()
+        if isinstance(transaction, TransactionMiner):
+            self.__rewards[id] = transaction
+            self.__stale = True
+        else:
+            self.__transactions[id] = transaction
+            if not self.__stale:
+                self.__view = self.__view.append(self.__dicts[id])
+                self.__ids = self.__ids.append(id)
+        self.__sizes[id] = size
+        self.__bytes += size
+        evicted = []
+        while self.__transactions and (
+            len(self) > self.__max_count or self.__bytes > self.__max_bytes
+        ):
+            evicted.append(self.__discard(next(iter(self.__transactions))))
+            # the oldest user transaction is the first one of the view
+            if not self.__stale:
+                self.__view = self.__view.drop_first()
+                self.__ids = self.__ids.drop_first()
+        return evicted
+
+    def __discard(self, id: str) -> Transaction:
+        """method to take a transaction out of the indexes"""
+        transaction = self.__transactions.pop(id, None) or self.__rewards.pop(id)
+        del self.__dicts[id]
+        self.__bytes -= self.__sizes.pop(id)
+        return transaction
+
+    def remove(self, ids: Iterable[str]) -> List[Transaction]:
+        """method to remove transactions by id, returns the ones that were in the mempool"""
+        removed = [self.__discard(id) for id in ids if id in self.__dicts]
+        if removed:
+            self.__stale = True
+        return removed
+
+    def clear(self) -> None:
+        """method to remove every transaction"""
+        self.__rewards.clear()
+        self.__transactions.clear()
+        self.__dicts.clear()
+        self.__sizes.clear()
+        self.__bytes = 0
+        self.__view = MempoolView()
+        self.__ids = MempoolView()
+        self.__stale = False
+
+    def to_list(self) -> List[dict]:
+        """method to return the dictionaries of the transactions in iteration order"""
+        return [self.__dicts[id] for id in [*self.__rewards, *self.__transactions]]
+
+
+class MerkleTree:
+    """class with the merkle tree operations over transaction ids"""
+
+    @staticmethod
+    def root(leaves: List[bytes]) -> bytes:
+        """method to calculate the merkle root of a list of leaves"""
+        if not leaves:
+            return bytes(32)
+        level = list(leaves)
+        while len(level) > 1:
+            level = MerkleTree.__next_level(level)
+        return level[0]
+
+    @staticmethod
+    def __next_level(level: List[bytes]) -> List[bytes]:
+        """method to hash the pairs of a level, the last node is paired with itself if alone"""
+        if len(level) % 2:
+            level.append(level[-1])
+        return [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+
+    @staticmethod
+    def proof(leaves: List[bytes], index: int) -> List[str]:
+        """method to get the sibling hashes that link the leaf at index to the merkle root"""
+        proof = []
+        level = list(leaves)
+        while len(level) > 1:
+            if len(level) % 2:
+                level.append(level[-1])
+            proof.append(level[index ^ 1].hex())
+            level = MerkleTree.__next_level(level)
+            index //= 2
+        return proof
+
+    @staticmethod
+    def verify(leaf: bytes, index: int, proof: List[str], root: str) -> bool:
+        """method to check that a leaf is at index in the merkle tree with the given root"""
+        hash = leaf
+        for sibling in proof:
+            sibling = bytes.fromhex(sibling)
+            if index % 2:
+                hash = hashlib.sha256(sibling + hash).digest()
+            else:
+                hash = hashlib.sha256(hash + sibling).digest()
+            index //= 2
+        return index == 0 and hash.hex() == root
+
+    @staticmethod
+    def transactions_root(transactions: List[Transaction]) -> str:
+        """method to calculate the merkle root of a list of transactions"""
+        leaves = [transaction.digest for transaction in transactions]
+        return MerkleTree.root(leaves).hex()
+
+
+def read_only(*args, **kwargs) -> None:
+    """function for the changing methods of the sealed containers, they always fail"""
+    raise TypeError("a sealed block can not be changed, change a copy")
+
+
+class FrozenDict(dict):
+    """class for a dictionary that can not be changed, json and the wire format take it as a dict"""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(self) -> tuple:
+        """method to pickle and copy as a plain dictionary, a copy can be changed"""
+        return dict, (dict(self),)
+
+
+class FrozenList(list):
+    """class for a list that can not be changed, it still compares equal to a plain list"""
+
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = read_only
+
+    def __reduce__(self) -> tuple:
+        """method to pickle and copy as a plain list, a copy can be changed"""
+        return list, (list(self),)
+
+
 class Block:
     """class for blocks"""
 
+    __slots__ = (
+        "__timestamp",
+        "__transactions",
+        "__previous_block",
+        "__magic_number",
+        "__difficulty",
+        "__version",
+        "__merkle_root",
+        "__hash",
+        "__chain_work",
+        "__dict",
+        "__encoded",
+    )
+
     class StatusHolder:
         """class for status holder"""
 
@@ -157,14 +740,27 @@ class Block:
         timestamp: datetime,
         previous_block: Block = None,
         magic_number: int = 1,
+        difficulty: int = DIFFICULTY,
+        version: int = BLOCK_VERSION,
+        merkle_root: str = None,
+        hash: str = None,
     ) -> None:
-        """constructor method for Block class"""
+        """constructor method for Block class, a given hash is trusted instead of calculated"""
         self.__timestamp: datetime = timestamp
         self.__transactions: List[Transaction] = transactions
         self.__previous_block: Block = previous_block
         self.__magic_number: int = magic_number
-        transactions = self.__transaction_to_dict()
-        self.__hash: str = self.calculate_hash(transactions, timestamp, self.__magic_number)
+        self.__difficulty: int = difficulty
+        self.__version: int = version
+        if version >= 2 and not (hash and merkle_root):
+            merkle_root = MerkleTree.transactions_root(transactions)
+        self.__merkle_root: str = merkle_root if version >= 2 else None
+        self.__hash: str = hash or self.__calculate_hash()
+        # work of the chain up to this block, the branch with the most work is the chain
+        self.__chain_work: int = (previous_block.chain_work if previous_block else 0) + self.work
+        # filled when the block is sealed, a block in the chain does not change anymore
+        self.__dict: dict = None
+        self.__encoded: bytes = None
 
     @property
     def timestamp(self) -> datetime:
@@ -181,11 +777,41 @@ class Block:
         """getter method for previous_hash"""
         return self.__previous_block
 
+    @property
+    def magic_number(self) -> int:
+        """getter method for magic_number"""
+        return self.__magic_number
+
+    @property
+    def difficulty(self) -> int:
+        """getter method for difficulty"""
+        return self.__difficulty
+
+    @property
+    def version(self) -> int:
+        """getter method for version"""
+        return self.__version
+
+    @property
+    def merkle_root(self) -> str:
+        """getter method for merkle_root"""
+        return self.__merkle_root
+
     @property
     def hash(self) -> str:
         """getter method for hash"""
         return self.__hash
 
+    @property
+    def work(self) -> int:
+        """getter method for the expected number of hashes of the proof of work"""
+        return proof_work(self.__version, self.__difficulty, self.__previous_block is None)
+
+    @property
+    def chain_work(self) -> int:
+        """getter method for the work of the chain up to and including the block"""
+        return self.__chain_work
+
     def __transaction_to_dict(self) -> list[dict]:
         """method to return a list of dictionaries with the transaction data"""
         transactions = []
@@ -201,153 +827,778 @@ class Block:
 
         return transactions
 
+    def __calculate_hash(self) -> str:
+        """method to calculate the hash of the block in its version format"""
+        if self.__version < 2:
+            return self.calculate_legacy_hash(
+                self.__transaction_to_dict(), self.__timestamp, self.__magic_number
+            )
+        return self.calculate_hash(self.header())
+
+    def header(self) -> bytes:
+        """method to return the fixed-size binary header of the block"""
+        return self.pack_header(
+            self.__version,
+            self.__previous_block.hash if self.__previous_block else None,
+            self.__merkle_root,
+            self.__timestamp,
+            self.__difficulty,
+            self.__magic_number,
+        )
+
     @staticmethod
-    def calculate_hash(data: List[Transaction], timestamp: datetime, number: int) -> str:
-        """method to calculate the hash of the block"""
+    def pack_header(
+        version: int,
+        previous_hash: str,
+        merkle_root: str,
+        timestamp: datetime,
+        difficulty: int,
+        number: int,
+    ) -> bytes:
+        """method to pack the header fields of a block into bytes"""
+        return struct.pack(
+            HEADER_FORMAT,
+            version,
+            bytes.fromhex(previous_hash) if previous_hash else bytes(32),
+            bytes.fromhex(merkle_root),
+            timestamp_to_int(timestamp),
+            difficulty,
+            number,
+        )
+
+    @staticmethod
+    def calculate_hash(header: bytes) -> str:
+        """method to calculate the hash of a block header"""
+        return hashlib.sha256(header).hexdigest()
+
+    @staticmethod
+    def calculate_legacy_hash(data: List[dict], timestamp: datetime, number: int) -> str:
+        """method to calculate the hash of a version 1 block"""
         input_data = str(data) + str(timestamp) + str(number)
         input_data = input_data.encode()
         hash = hashlib.sha256(input_data)
         return hash.hexdigest()
 
-    def mine_block(self, difficulty: int, status: StatusHolder) -> bool:
+    def is_proof_valid(self) -> bool:
+        """method to check if the hash meets the difficulty, version 1 blocks carry no proof"""
+        if self.__version < 2:
+            # a block without proof can not continue a chain that already has one
+            return self.previous_block is None or self.previous_block.version < 2
+        return self.__difficulty >= DIFFICULTY and self.__hash.startswith("0" * self.__difficulty)
+
+    def mine_block(
+        self, difficulty: int, status: StatusHolder, engine: MiningEngine = None
+    ) -> bool:
         """method to mine the block"""
-        flag = self.__hash[:difficulty] != "0" * difficulty
-        while flag and status.status:
-            self.__magic_number += 1
-            transactions = self.__transaction_to_dict()
-            self.__hash = self.calculate_hash(transactions, self.__timestamp, self.__magic_number)
-            flag = self.__hash[:difficulty] != "0" * difficulty
-        if flag:
+        self.__chain_work -= self.work
+        self.__difficulty = difficulty
+        self.__chain_work += self.work
+        self.__hash = self.__calculate_hash()
+        if self.__hash[:difficulty] == "0" * difficulty:
+            return True
+        engine = engine or MiningEngine()
+        if self.__version < 2:
+            prefix = (str(self.__transaction_to_dict()) + str(self.__timestamp)).encode()
+            binary = False
+        else:
+            # the header prefix is fixed, so each attempt only hashes the nonce bytes
+            prefix = self.header()[:-NONCE_SIZE]
+            binary = True
+        magic_number = engine.mine(prefix, difficulty, status, self.__magic_number + 1, binary)
+        if magic_number is None:
             return False
+        self.__magic_number = magic_number
+        self.__hash = self.__calculate_hash()
         return True
 
+    @property
+    def encoded(self) -> bytes:
+        """getter method for the compact json of a sealed block, None until it is sealed"""
+        return self.__encoded
+
+    def seal(self) -> None:
+        """method to cache the dictionary and json of the block once it is in the chain"""
+        if self.__dict is None:
+            data = self.to_dict()
+            # the dictionary is shared by every reader, so it and its transactions are read only
+            data["transactions"] = FrozenList(map(FrozenDict, data["transactions"]))
+            self.__dict = FrozenDict(data)
+            self.__encoded = json.dumps(self.__dict, separators=(",", ":")).encode()
+
     def to_dict(self) -> dict:
-        """method to return a dictionary with the block data"""
+        """method to return a dictionary with the block data, shared and read only once sealed"""
+        if self.__dict is not None:
+            return self.__dict
         return {
-            "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "version": self.version,
+            "timestamp": self.timestamp.strftime(TIMESTAMP_FORMAT),
             "transactions": [transaction.to_dict() for transaction in self.transactions],
             "previous_block": self.previous_block.hash if self.previous_block else None,
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
             "magic_number": self.__magic_number,
             "hash": self.hash,
         }
 
 
+class ChainState:
+    """class for a consistent view of the blockchain that is never changed once published"""
+
+    __slots__ = (
+        "__blocks",
+        "__dicts",
+        "__balances",
+        "__pending",
+        "__mempool",
+        "__version",
+        "__mempool_ids",
+        "__fingerprint",
+    )
+
+    def __init__(
+        self,
+        blocks: Tuple[Block, ...] = (),
+        dicts: Tuple[dict, ...] = (),
+        balances: Mapping[str, float] = MappingProxyType({}),
+        pending: Mapping[str, float] = MappingProxyType({}),
+        mempool: Sequence[dict] = (),
+        version: int = 0,
+        mempool_ids: Sequence[str] = (),
+    ) -> None:
+        """constructor method for ChainState class, dicts holds the dictionaries of the blocks"""
+        self.__blocks: Tuple[Block, ...] = blocks
+        self.__dicts: Tuple[dict, ...] = dicts
+        self.__balances: Mapping[str, float] = balances
+        self.__pending: Mapping[str, float] = pending
+        self.__mempool: Sequence[dict] = mempool
+        # every published state has a higher version than the one before
+        self.__version: int = version
+        self.__mempool_ids: Sequence[str] = mempool_ids
+        # the digest sorts the ids, so it is only calculated for the states that are compared
+        self.__fingerprint: Tuple[str, int, str] = None
+
+    @property
+    def version(self) -> int:
+        """getter method for the version, it grows with every published state"""
+        return self.__version
+
+    @property
+    def fingerprint(self) -> Tuple[str, int, str]:
+        """getter method for the tip hash, the tip height and the digest of the mempool"""
+        if self.__fingerprint is None and self.__blocks:
+            self.__fingerprint = (
+                self.__blocks[-1].hash,
+                len(self.__blocks) - 1,
+                Mempool.digest_ids(self.__mempool_ids),
+            )
+        return self.__fingerprint
+
+    @property
+    def blocks(self) -> Tuple[Block, ...]:
+        """getter method for the blocks of the chain"""
+        return self.__blocks
+
+    @property
+    def dicts(self) -> Tuple[dict, ...]:
+        """getter method for the dictionaries of the blocks"""
+        return self.__dicts
+
+    @property
+    def balances(self) -> Mapping[str, float]:
+        """getter method for the confirmed balances"""
+        return self.__balances
+
+    @property
+    def pending(self) -> Mapping[str, float]:
+        """getter method for the balance changes of the mempool"""
+        return self.__pending
+
+    @property
+    def mempool(self) -> Sequence[dict]:
+        """getter method for the dictionaries of the pending transactions"""
+        return self.__mempool
+
+    def to_dict(self) -> dict:
+        """method to return a dictionary with the blockchain data"""
+        return {
+            "chain": list(self.__dicts),
+            "length": len(self.__blocks),
+            "mempool": list(self.__mempool),
+        }
+
+    def describes(self, data: dict) -> bool:
+        """method to check if a blockchain dictionary was made from this state"""
+        chain = data["chain"]
+        # a sealed block has one dictionary, the same tip at the same height is the same chain
+        return (
+            len(chain) == len(self.__dicts)
+            and bool(chain)
+            and chain[-1] is self.__dicts[-1]
+            and (data["mempool"] is self.__mempool or data["mempool"] == list(self.__mempool))
+        )
+
+    def to_bytes(self) -> bytes:
+        """method to return the compact json of the blockchain from the cached json of the blocks"""
+        return b"".join(
+            (
+                b'{"chain":[',
+                b",".join(block.encoded for block in self.__blocks),
+                b'],"length":%d,"mempool":' % len(self.__blocks),
+                json.dumps(list(self.__mempool), separators=(",", ":")).encode(),
+                b"}",
+            )
+        )
+
+
+class BlockTree:
+    """class for the validated blocks of every branch by hash and the blocks missing a parent"""
+
+    def __init__(self, size: int = VALIDATED_CACHE_SIZE, orphans: int = ORPHAN_CACHE_SIZE) -> None:
+        """constructor method for BlockTree class"""
+        self.__size: int = size
+        self.__orphan_size: int = orphans
+        # the oldest blocks are forgotten first, the chain holds its own blocks anyway
+        self.__blocks: OrderedDict[str, Block] = OrderedDict()
+        # received blocks by hash, they are validated once their parent is known
+        self.__orphans: OrderedDict[str, dict] = OrderedDict()
+
+    def __len__(self) -> int:
+        """method to return the number of validated blocks"""
+        return len(self.__blocks)
+
+    def __contains__(self, hash: str) -> bool:
+        """method to check if a validated block has a hash, the orphans are not validated yet"""
+        return hash in self.__blocks
+
+    @property
+    def orphans(self) -> int:
+        """getter method for the number of blocks waiting for their parent"""
+        return len(self.__orphans)
+
+    def get(self, hash: str) -> Block:
+        """method to get a validated block by hash, None if it is not in the tree"""
+        return self.__blocks.get(hash)
+
+    def add(self, block: Block) -> None:
+        """method to add a validated block"""
+        self.__blocks[block.hash] = block
+        self.__blocks.move_to_end(block.hash)
+        if len(self.__blocks) > self.__size:
+            self.__blocks.popitem(last=False)
+
+    def add_orphan(self, block_data: dict) -> None:
+        """method to keep a received block until its parent arrives"""
+        self.__orphans[block_data["hash"]] = block_data
+        if len(self.__orphans) > self.__orphan_size:
+            self.__orphans.popitem(last=False)
+
+    def take_orphans(self, hash: str) -> List[dict]:
+        """method to remove and return the orphans whose parent has a hash"""
+        children = [data for data in self.__orphans.values() if data["previous_block"] == hash]
+        for data in children:
+            del self.__orphans[data["hash"]]
+        return children
+
+    def drop_orphans(self, hash: str) -> None:
+        """method to remove the orphans that descend from an invalid block"""
+        hashes = [hash]
+        while hashes:
+            hashes.extend(data["hash"] for data in self.take_orphans(hashes.pop()))
+
+
 class Blockchain:
     """class for blockchain"""
 
-    def __init__(self) -> None:
-        """constructor method for Blockchain class"""
-        self.__chain: List[Block] = [self.__create_genesis_block()]
-        self.__difficulty: int = 4
-        self.__mempool: List[Transaction] = []
+    class Outcome(Enum):
+        """enumeration for what became of received blocks"""
+
+        # the blocks made a branch with more work than the chain, it is the chain now
+        ADOPTED = 0
+        # the blocks are valid or known and wait in a side branch
+        STORED = 1
+        # a block continues no known block, the sender is asked for the missing ones
+        ORPHAN = 2
+        INVALID = 3
+
+    # process pools of the parallel validation by number of workers, started once and kept
+    __pools: Dict[int, ProcessPoolExecutor] = {}
+    __pools_lock: threading.Lock = threading.Lock()
+    # signatures checked by the static validation, the ones of a chain are checked once
+    __shared_verifier: SignatureVerifier = SignatureVerifier()
+
+    def __init__(
+        self, store: BlockStore = None, snapshots: SnapshotStore = None, mempool: Mempool = None
+    ) -> None:
+        """constructor method for Blockchain class, store keeps the blocks on disk"""
+        self.__difficulty: int = DIFFICULTY
+        self.__store: BlockStore = store
+        self.__snapshots: SnapshotStore = snapshots
+        # the latest snapshot, the blocks up to it are trusted
+        self.__checkpoint: dict = snapshots.load() if snapshots is not None else None
+        self.__snapshot_height: int = self.__checkpoint["height"] if self.__checkpoint else 0
+        self.__chain: List[Block] = []
+        self.__heights: Dict[str, int] = {}
+        # heights and positions of the confirmed transactions of each address
+        self.__addresses: Dict[str, List[Tuple[int, int]]] = {}
+        # height and position of each confirmed transaction by id
+        self.__locations: Dict[str, Tuple[int, int]] = {}
+        # validated blocks of every branch, a heavier branch becomes the chain
+        self.__tree: BlockTree = BlockTree()
+        self.__mempool: Mempool = mempool if mempool is not None else Mempool()
         self.__mining_reward: int = 10
+        # confirmed balances of the chain and balance changes of the mempool
+        self.__balances: Dict[str, float] = {}
+        self.__pending: Dict[str, float] = {}
+        # values of the pending balances by state version, the addresses changed since the last one
+        self.__pending_log: BalanceLog = BalanceLog()
+        self.__changed: Set[str] = set()
+        self.__mining_engine: MiningEngine = MiningEngine()
+        self.__verifier: SignatureVerifier = SignatureVerifier()
+        # writers take turns and publish a new state, readers use the last one without locking
+        self.__lock: threading.RLock = threading.RLock()
+        self.__state: ChainState = ChainState()
+        if store is not None and len(store):
+            self.__load()
+        else:
+            self.__append_block(self.__create_genesis_block())
+        self.__publish(chain=True)
 
     @property
-    def chain(self) -> List[Block]:
+    def state(self) -> ChainState:
+        """getter method for the last published state"""
+        return self.__state
+
+    @property
+    def chain(self) -> Tuple[Block, ...]:
         """getter method for chain"""
-        return self.__chain
+        return self.__state.blocks
+
+    @property
+    def version(self) -> int:
+        """getter method for the version of the state, it grows with every change"""
+        return self.__state.version
+
+    @property
+    def fingerprint(self) -> Tuple[str, int, str]:
+        """getter method for the tip hash, the tip height and the digest of the mempool"""
+        return self.__state.fingerprint
+
+    @property
+    def work(self) -> int:
+        """getter method for the work of the chain, fork choice follows the most work"""
+        return self.__state.blocks[-1].chain_work
+
+    @staticmethod
+    def chain_work(chain: list) -> int:
+        """method to calculate the work of the blocks of a chain dictionary"""
+        return sum(
+            proof_work(block.get("version", 1), block.get("difficulty", DIFFICULTY), not height)
+            for height, block in enumerate(chain)
+        )
+
+    @staticmethod
+    def fingerprint_of(data: dict) -> Tuple[str, int, str]:
+        """method to calculate the fingerprint of a blockchain dictionary"""
+        chain = data["chain"]
+        if not chain:
+            return None
+        return chain[-1]["hash"], len(chain) - 1, Mempool.digest_of(data["mempool"])
 
     @property
-    def mempool(self) -> List[Transaction]:
+    def mempool(self) -> Mempool:
         """getter method for mempool"""
         return self.__mempool
 
+    @property
+    def signature_stats(self) -> dict:
+        """getter method for the signature verification statistics"""
+        return self.__verifier.stats
+
     @property
     def mining_reward(self) -> float:
         """getter method for mining_reward"""
         return self.__mining_reward
 
+    def __publish(self, chain: bool = False) -> None:
+        """method to replace the state seen by the readers with the current one in one step"""
+        state = self.__state
+        blocks, dicts = state.blocks, state.dicts
+        if chain:
+            blocks = tuple(self.__chain)
+            # the dictionaries of the blocks shared with the last state are reused
+            keep = min(len(blocks), len(state.blocks))
+            while keep and blocks[keep - 1] is not state.blocks[keep - 1]:
+                keep -= 1
+            dicts = dicts[:keep] + tuple(block.to_dict() for block in blocks[keep:])
+        version = state.version + 1
+        # only the changed balances are recorded, a full copy once the log doubles the index
+        if len(self.__pending_log) > 2 * len(self.__pending) + 64:
+            self.__pending_log = BalanceLog()
+            self.__changed = set(self.__pending)
+        for address in self.__changed:
+            self.__pending_log.record(address, self.__pending.get(address), version)
+        self.__changed = set()
+        self.__state = ChainState(
+            blocks,
+            dicts,
+            MappingProxyType(dict(self.__balances)) if chain else state.balances,
+            BalanceView(self.__pending_log, version),
+            self.__mempool.view,
+            version,
+            self.__mempool.ids,
+        )
+
     def __create_genesis_block(self) -> Block:
         """method to create the genesis block"""
-        return Block([], datetime.datetime.now())
+        return Block([], datetime.datetime.now(), difficulty=self.__difficulty)
+
+    def __append_block(self, block: Block, apply: bool = True) -> None:
+        """method to add a block at the end of the chain and to the indexes"""
+        block.seal()
+        self.__chain.append(block)
+        self.__heights[block.hash] = len(self.__chain) - 1
+        self.__index_block(block, len(self.__chain) - 1)
+        if apply:
+            self.__apply_block(block)
+        if self.__store is not None:
+            self.__store.append(block.to_dict())
+
+    def __load(self) -> None:
+        """method to read the whole chain stored on disk, the stored blocks are not hashed again"""
+        checkpoint = -1
+        checkpoint_hash = self.__checkpoint["hash"] if self.__checkpoint else None
+        if checkpoint_hash and self.__store.height(checkpoint_hash) == self.__checkpoint["height"]:
+            # the balances up to the snapshot are not replayed
+            checkpoint = self.__checkpoint["height"]
+            self.__balances = dict(self.__checkpoint["balances"])
+        previous_block = None
+        for block_data in self.__store:
+            previous_block = self.__create_block(block_data, previous_block, trusted=True)
+            previous_block.seal()
+            self.__chain.append(previous_block)
+            self.__heights[previous_block.hash] = len(self.__chain) - 1
+            self.__index_block(previous_block, len(self.__chain) - 1)
+            if len(self.__chain) - 1 > checkpoint:
+                self.__apply_block(previous_block)
+        if checkpoint == len(self.__chain) - 1:
+            self.__set_mempool(self.__create_transactions(self.__checkpoint["mempool"]))
+
+    @staticmethod
+    def parties(transaction: Transaction) -> Set[str]:
+        """method to get the addresses whose balance a transaction changes"""
+        if isinstance(transaction, TransactionMiner):
+            return {transaction.miner}
+        return {transaction.sender, transaction.receiver}
+
+    def __index_block(self, block: Block, height: int) -> None:
+        """method to add the transactions of a block to the transaction and address indexes"""
+        for index, transaction in enumerate(block.transactions):
+            self.__locations[transaction.id] = (height, index)
+            for address in self.parties(transaction):
+                self.__addresses.setdefault(address, []).append((height, index))
+
+    def __unindex_block(self, block: Block, height: int) -> None:
+        """method to remove the transactions of the last block from the indexes"""
+        for transaction in block.transactions:
+            # an earlier block with the same transaction keeps its entry
+            if self.__locations.get(transaction.id, (height,))[0] == height:
+                self.__locations.pop(transaction.id, None)
+            for address in self.parties(transaction):
+                self.__addresses[address].pop()
+
+    def proofs(self, public_key: str, from_height: int = 0) -> List[dict]:
+        """method to get merkle proofs of the transactions of an address from a height on"""
+        with self.__lock:
+            blocks = self.__state.blocks
+            locations = list(self.__addresses.get(public_key, []))
+        leaves: Dict[int, List[bytes]] = {}
+        proofs = []
+        for height, index in locations[bisect_left(locations, (from_height, 0)) :]:
+            block = blocks[height]
+            if block.version < 2:
+                continue
+            if height not in leaves:
+                leaves[height] = [item.digest for item in block.transactions]
+            proofs.append(
+                {
+                    "transaction": block.transactions[index].to_dict(),
+                    "block": block.hash,
+                    "height": height,
+                    "index": index,
+                    "proof": MerkleTree.proof(leaves[height], index),
+                }
+            )
+        return proofs
 
     def get_latest_block(self) -> Block:
         """method to get the latest block"""
-        return self.__chain[-1]
+        return self.__state.blocks[-1]
 
     def mine_block(self, public_key: str, status: Block.StatusHolder) -> bool:
         """method to mine pending transactions"""
-        block = Block(self.__mempool, datetime.datetime.now(), self.get_latest_block())
-        if not block.mine_block(self.__difficulty, status):
+        with self.__lock:
+            transactions = list(self.__mempool)
+            previous_block = self.__chain[-1]
+        block = Block(transactions, datetime.datetime.now(), previous_block, 1, self.__difficulty)
+        # the proof of work is searched without holding the lock
+        if not block.mine_block(self.__difficulty, status, self.__mining_engine):
             return False
-        print("Block successfully mined!")
-        for transaction in block.transactions:
-            transaction.change_status(Transaction.Status.CONFIRMED)
-        self.__chain.append(block)
-        self.__mempool = [TransactionMiner(self.__mining_reward, public_key)]
+        with self.__lock:
+            if self.__chain[-1] is not previous_block:
+                # another block arrived while mining, this one no longer extends the chain
+                return False
+            print("Block successfully mined!")
+            for transaction in block.transactions:
+                transaction.change_status(Transaction.Status.CONFIRMED)
+            self.__append_block(block)
+            # transactions received while mining were not hashed into the block and stay
+            self.__remove_from_mempool(transaction.id for transaction in block.transactions)
+            self.__add_to_mempool(
+                TransactionMiner(
+                    self.__mining_reward, public_key, timestamp=datetime.datetime.now()
+                )
+            )
+            self.__save_snapshot()
+            self.__publish(chain=True)
         return True
 
-    def create_transaction(self, sender: str, receiver: str, amount: float) -> None:
-        """method to create a transaction"""
-        transaction = TransactionUser(amount, sender, receiver)
-        self.__mempool.append(transaction)
+    def create_transaction(
+        self, sender: str, receiver: str, amount: float, signing_key: SigningKey
+    ) -> TransactionUser:
+        """method to create a transaction signed by the sender, None if the key is another one"""
+        if signing_key.verifying_key.to_string("compressed").hex() != sender:
+            return None
+        transaction = TransactionUser(amount, sender, receiver, timestamp=datetime.datetime.now())
+        transaction.sign(signing_key)
+        # the verified signature is remembered, so it is not checked again once mined
+        if not self.__verifier.verify([transaction]):
+            return None
+        with self.__lock:
+            self.__add_to_mempool(transaction)
+            self.__publish()
         return transaction
 
-    # TODO: refactor this method
+    @staticmethod
+    def apply_transaction(
+        balances: Dict[str, float], transaction: Transaction, sign: int = 1
+    ) -> None:
+        """method to add (sign 1) or revert (sign -1) a transaction in a balance index"""
+        if isinstance(transaction, TransactionUser):
+            balances[transaction.sender] = (
+                balances.get(transaction.sender, 0) - sign * transaction.amount
+            )
+            if transaction.receiver != transaction.sender:
+                balances[transaction.receiver] = (
+                    balances.get(transaction.receiver, 0) + sign * transaction.amount
+                )
+        elif isinstance(transaction, TransactionMiner):
+            balances[transaction.miner] = (
+                balances.get(transaction.miner, 0) + sign * transaction.reward
+            )
+
+    def __apply_block(self, block: Block, sign: int = 1) -> None:
+        """method to add (sign 1) or revert (sign -1) the confirmed transactions of a block"""
+        for transaction in block.transactions:
+            if transaction.status == Transaction.Status.CONFIRMED:
+                self.apply_transaction(self.__balances, transaction, sign)
+
+    def __add_to_mempool(self, transaction: Transaction) -> bool:
+        """method to add a transaction to the mempool and to the pending balances"""
+        evicted = self.__mempool.add(transaction)
+        if evicted is None:
+            return False
+        self.__apply_pending(transaction)
+        for old in evicted:
+            self.__apply_pending(old, -1)
+        return True
+
+    def __apply_pending(self, transaction: Transaction, sign: int = 1) -> None:
+        """method to add (sign 1) or revert (sign -1) a transaction in the pending balances"""
+        self.apply_transaction(self.__pending, transaction, sign)
+        if isinstance(transaction, TransactionUser):
+            self.__changed.update((transaction.sender, transaction.receiver))
+        elif isinstance(transaction, TransactionMiner):
+            self.__changed.add(transaction.miner)
+
+    def __remove_from_mempool(self, ids: Iterable[str]) -> None:
+        """method to remove transactions from the mempool and from the pending balances"""
+        for transaction in self.__mempool.remove(ids):
+            self.__apply_pending(transaction, -1)
+
+    def __set_mempool(self, transactions: List[Transaction]) -> None:
+        """method to replace the mempool and rebuild the pending balances"""
+        self.__mempool.clear()
+        self.__pending = {}
+        # the published states keep the old log, the new one only has the new balances
+        self.__pending_log = BalanceLog()
+        self.__changed = set()
+        for transaction in transactions:
+            self.__add_to_mempool(transaction)
+
+    def snapshot(self) -> dict:
+        """method to take a snapshot of the state at the tip, it is saved in the background"""
+        with self.__lock:
+            return self.__take_snapshot()
+
+    def __take_snapshot(self) -> dict:
+        """method to take a snapshot of the working state of the writer"""
+        block = self.__chain[-1]
+        snapshot = {
+            "hash": block.hash,
+            "height": len(self.__chain) - 1,
+            "balances": dict(self.__balances),
+            "mempool": self.__mempool.to_list(),
+        }
+        self.__checkpoint = snapshot
+        self.__snapshot_height = snapshot["height"]
+        if self.__snapshots is not None:
+            self.__snapshots.save(snapshot)
+        return snapshot
+
+    def __save_snapshot(self) -> None:
+        """method to take a snapshot every SNAPSHOT_INTERVAL blocks"""
+        if self.__snapshots is None:
+            return
+        if len(self.__chain) - 1 - self.__snapshot_height >= SNAPSHOT_INTERVAL:
+            self.__take_snapshot()
+
     def get_balance(self, public_key: str) -> float:
-        """method to get the balance of an address"""
-        balance = 0
-        for block in self.__chain:
-            for transaction in block.transactions:
-                if transaction.status == Transaction.Status.CONFIRMED:
-                    if isinstance(transaction, TransactionUser):
-                        if transaction.sender == public_key:
-                            balance -= transaction.amount
-                        elif transaction.receiver == public_key:
-                            balance += transaction.amount
-                    elif isinstance(transaction, TransactionMiner):
-                        if transaction.miner == public_key:
-                            balance += transaction.reward
-        return balance
-
-    # TODO: refactor this method
+        """method to get the confirmed balance of an address"""
+        return self.__state.balances.get(public_key, 0)
+
+    def get_pending_balance(self, public_key: str) -> float:
+        """method to get the balance of an address including the transactions in the mempool"""
+        state = self.__state
+        return state.balances.get(public_key, 0) + state.pending.get(public_key, 0)
+
     @staticmethod
-    def is_chain_valid(chain: dict) -> bool:
-        """method to check if the chain is valid"""
-        for i in range(1, len(chain)):
-            current_block = chain[i]
-            previous_block = chain[i - 1]
+    def is_block_valid(block: dict, verifier: SignatureVerifier = None) -> bool:
+        """method to check if the hash of a block matches its data and its signatures are valid"""
+        verifier = verifier or Blockchain.__shared_verifier
+        return Blockchain.is_hash_valid(block) and verifier.verify(Blockchain.__signed_by([block]))
+
+    @staticmethod
+    def __signed_by(blocks: Iterable[dict]) -> List[TransactionUser]:
+        """method to create the user transactions of blocks, version 1 blocks are unsigned"""
+        return [
+            transaction
+            for block in blocks
+            if block.get("version", 1) >= 2
+            for transaction in map(Transaction.from_dict, block["transactions"])
+            if isinstance(transaction, TransactionUser)
+        ]
+
+    @staticmethod
+    def is_hash_valid(block: dict) -> bool:
+        """method to check if the hash of a block matches its data, without the signatures"""
+        transactions = [Transaction.from_dict(transaction) for transaction in block["transactions"]]
+        timestamp = parse_timestamp(block["timestamp"])
+        if block.get("version", 1) < 2:
             transactions = [
                 {
                     "amount": transaction["amount"],
                     "sender": transaction["sender"],
                     "receiver": transaction["receiver"],
                 }
-                for transaction in current_block["transactions"]
+                for transaction in block["transactions"]
             ]
-            if current_block["hash"] != Block.calculate_hash(
-                transactions,
-                datetime.datetime.strptime(current_block["timestamp"], "%Y-%m-%d %H:%M:%S.%f"),
-                current_block["magic_number"],
-            ):
+            return block["hash"] == Block.calculate_legacy_hash(
+                transactions, timestamp, block["magic_number"]
+            )
+        merkle_root = MerkleTree.transactions_root(transactions)
+        if block["merkle_root"] != merkle_root or block["difficulty"] < DIFFICULTY:
+            return False
+        header = Block.pack_header(
+            block["version"],
+            block["previous_block"],
+            merkle_root,
+            timestamp,
+            block["difficulty"],
+            block["magic_number"],
+        )
+        if block["hash"] != Block.calculate_hash(header):
+            return False
+        return block["hash"].startswith("0" * block["difficulty"])
+
+    @staticmethod
+    def is_chain_valid(chain: dict, verifier: SignatureVerifier = None) -> bool:
+        """method to check if the chain is valid, the signatures in one batch of the verifier"""
+        verifier = verifier or Blockchain.__shared_verifier
+        return Blockchain.__are_hashes_valid(chain) and verifier.verify(
+            Blockchain.__signed_by(chain[1:])
+        )
+
+    @staticmethod
+    def __are_hashes_valid(chain: list) -> bool:
+        """method to check the hashes and the links of the blocks after the first one"""
+        for i in range(1, len(chain)):
+            current_block = chain[i]
+            previous_block = chain[i - 1]
+            if not Blockchain.is_hash_valid(current_block):
                 return False
             if (
                 not current_block["previous_block"]
                 or current_block["previous_block"] != previous_block["hash"]
             ):
                 return False
+            # a block without proof can not continue a chain that already has one
+            if current_block.get("version", 1) < 2 <= previous_block.get("version", 1):
+                return False
         return True
 
+    @staticmethod
+    def is_chain_valid_parallel(
+        chain: list, workers: int = None, verifier: SignatureVerifier = None
+    ) -> bool:
+        """method to check if the chain is valid hashing ranges of blocks in a process pool"""
+        verifier = verifier or Blockchain.__shared_verifier
+        return Blockchain.__are_hashes_valid_parallel(chain, workers) and verifier.verify(
+            Blockchain.__signed_by(chain[1:])
+        )
+
+    @staticmethod
+    def __are_hashes_valid_parallel(chain: list, workers: int = None) -> bool:
+        """method to check the hashes in a process pool and the links of the blocks serially"""
+        blocks = chain[1:]
+        chunks = [
+            blocks[i : i + VALIDATION_CHUNK_SIZE]
+            for i in range(0, len(blocks), VALIDATION_CHUNK_SIZE)
+        ]
+        workers = workers or os.cpu_count() or 1
+        executor = Blockchain.__validation_pool(workers)
+        pending = {executor.submit(first_invalid_block, chunk) for chunk in chunks}
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if any(future.result() >= 0 for future in done):
+                    return False
+        except BrokenProcessPool:
+            # a worker died, the next call starts a new pool and this one is checked serially
+            with Blockchain.__pools_lock:
+                Blockchain.__pools.pop(workers, None)
+            return Blockchain.__are_hashes_valid(chain)
+        finally:
+            for future in pending:
+                future.cancel()
+        # the linkage only compares neighbouring hashes, so it is cheap to do serially
+        for i in range(1, len(chain)):
+            if not chain[i]["previous_block"] or chain[i]["previous_block"] != chain[i - 1]["hash"]:
+                return False
+            if chain[i].get("version", 1) < 2 <= chain[i - 1].get("version", 1):
+                return False
+        return True
+
+    @staticmethod
+    def __validation_pool(workers: int) -> ProcessPoolExecutor:
+        """method to get the process pool of the parallel validation, it is started on first use"""
+        with Blockchain.__pools_lock:
+            if workers not in Blockchain.__pools:
+                Blockchain.__pools[workers] = ProcessPoolExecutor(workers)
+            return Blockchain.__pools[workers]
+
     def __create_transaction(self, transaction_data: dict) -> Transaction:
         """method to create a transaction from a dictionary"""
-        if transaction_data["sender"] == "ITcoin":
-            transaction = TransactionMiner(
-                transaction_data["amount"],
-                transaction_data["receiver"],
-                Transaction.Status.CONFIRMED
-                if transaction_data["status"] == "CONFIRMED"
-                else Transaction.Status.PENDING,
-            )
-        else:
-            transaction = TransactionUser(
-                transaction_data["amount"],
-                transaction_data["sender"],
-                transaction_data["receiver"],
-                Transaction.Status.CONFIRMED
-                if transaction_data["status"] == "CONFIRMED"
-                else Transaction.Status.PENDING,
-            )
-        return transaction
+        return Transaction.from_dict(transaction_data)
 
     def __create_transactions(self, transactions_data: dict) -> list[Transaction]:
         """method to create a list of transactions from a dictionary"""
@@ -357,31 +1608,370 @@ class Blockchain:
             transactions.append(transaction)
         return transactions
 
+    def knows(self, hash: str) -> bool:
+        """method to check if a block is in the chain or in a side branch, orphans are not known"""
+        return self.height(hash) >= 0 or hash in self.__tree
+
+    def __height_in(self, blocks: Tuple[Block, ...], hash: str) -> int:
+        """method to get the height of a block in published blocks, -1 if it is not there"""
+        height = self.__heights.get(hash, -1)
+        # the index belongs to the writer, the answer is checked against the published blocks
+        if height < 0 or height >= len(blocks) or blocks[height].hash != hash:
+            return -1
+        return height
+
+    def height(self, hash: str) -> int:
+        """method to get the height of a block in the chain, -1 if it is not in the chain"""
+        return self.__height_in(self.__state.blocks, hash)
+
+    @staticmethod
+    def __describe_block(blocks: Tuple[Block, ...], height: int) -> dict:
+        """method to return a block of the chain with its height and confirmations"""
+        return {
+            "block": blocks[height].to_dict(),
+            "height": height,
+            "confirmations": len(blocks) - height,
+        }
+
+    def get_block(self, hash: str) -> dict:
+        """method to get a block of the chain by hash, None if it is not in the chain"""
+        blocks = self.__state.blocks
+        height = self.__height_in(blocks, hash)
+        return self.__describe_block(blocks, height) if height >= 0 else None
+
+    def get_block_at(self, height: int) -> dict:
+        """method to get the block of the chain at a height, None if the chain is shorter"""
+        blocks = self.__state.blocks
+        return self.__describe_block(blocks, height) if 0 <= height < len(blocks) else None
+
+    def get_transaction(self, id: str) -> dict:
+        """method to get a confirmed or pending transaction by id, None if it is unknown"""
+        blocks = self.__state.blocks
+        height, index = self.__locations.get(id, (-1, -1))
+        if 0 <= height < len(blocks):
+            transactions = blocks[height].to_dict()["transactions"]
+            # the index belongs to the writer, the position is checked in the published block
+            if index < len(transactions) and blocks[height].transactions[index].id == id:
+                return {
+                    "transaction": transactions[index],
+                    "block": blocks[height].hash,
+                    "height": height,
+                    "index": index,
+                    "confirmations": len(blocks) - height,
+                }
+        transaction = self.__mempool.get(id)
+        if transaction is None:
+            return None
+        return {
+            "transaction": transaction,
+            "block": None,
+            "height": None,
+            "index": None,
+            "confirmations": 0,
+        }
+
+    def get_history(self, public_key: str, start: int = 0, limit: int = PAGE_SIZE) -> dict:
+        """method to get a page of the confirmed transactions of an address, oldest first"""
+        start, limit = max(start, 0), min(max(limit, 1), MAX_PAGE_SIZE)
+        with self.__lock:
+            blocks = self.__state.blocks
+            locations = self.__addresses.get(public_key, [])
+            total = len(locations)
+            page = locations[start : start + limit]
+        end = start + len(page)
+        return {
+            "transactions": [
+                {
+                    "transaction": blocks[height].to_dict()["transactions"][index],
+                    "block": blocks[height].hash,
+                    "height": height,
+                    "index": index,
+                }
+                for height, index in page
+            ],
+            "total": total,
+            "next": end if end < total else None,
+        }
+
+    def common_prefix(self, chain: list) -> int:
+        """method to get how many leading blocks of a chain are in the local chain"""
+        # a block hash covers the previous hash, so the first match from the top is the fork
+        with self.__lock:
+            for height in range(min(len(chain), len(self.__chain)) - 1, -1, -1):
+                if self.__heights.get(chain[height]["hash"]) == height:
+                    return height + 1
+            return 0
+
+    def __checkpoint_height(self, chain: list) -> int:
+        """method to get the height of the snapshot block in a chain, -1 if it is not there"""
+        checkpoint = self.__checkpoint
+        if checkpoint and checkpoint["height"] < len(chain):
+            if chain[checkpoint["height"]]["hash"] == checkpoint["hash"]:
+                return checkpoint["height"]
+        return -1
+
+    def __validated_block(self, block_data: dict, previous_block: Block) -> Block:
+        """method to get an already validated block with the same hash and parent"""
+        block = self.__tree.get(block_data["hash"])
+        if block and block.previous_block is previous_block:
+            return block
+        return None
+
+    def __create_block(
+        self, block_data: dict, previous_block: Block, trusted: bool = False
+    ) -> Block:
+        """method to create a block from a dictionary, trusted blocks keep their hash"""
+        return Block(
+            self.__create_transactions(block_data["transactions"]),
+            parse_timestamp(block_data["timestamp"]),
+            previous_block,
+            block_data["magic_number"],
+            block_data.get("difficulty", DIFFICULTY),
+            block_data.get("version", 1),
+            block_data.get("merkle_root") if trusted else None,
+            block_data["hash"] if trusted else None,
+        )
+
+    def validate_chain(self, chain: list, parallel: bool = None) -> bool:
+        """method to check a chain verifying only unknown blocks, the shared ones become local"""
+        with self.__lock:
+            return self.__validate_chain(chain, parallel)
+
+    def __validate_chain(self, chain: list, parallel: bool) -> bool:
+        """method to check a chain against the working state of the writer"""
+        fork = self.common_prefix(chain)
+        # only the top shared block is compared, the ones below it are taken from the local chain
+        chain[:fork] = [block.to_dict() for block in self.__chain[:fork]]
+        checkpoint = self.__checkpoint_height(chain)
+        if parallel is None:
+            # one core hashes as fast alone, the pool only adds the cost of sending the blocks
+            parallel = (
+                len(chain) - fork >= PARALLEL_VALIDATION_THRESHOLD and (os.cpu_count() or 1) > 1
+            )
+        if parallel and not self.__are_hashes_valid_parallel(chain[max(fork - 1, 0) :]):
+            return False
+        previous_block = self.__chain[fork - 1] if fork else None
+        created = []
+        transactions = []
+        for height in range(fork, len(chain)):
+            block_data = chain[height]
+            block = self.__validated_block(block_data, previous_block)
+            if not block:
+                if previous_block and block_data["previous_block"] != previous_block.hash:
+                    return False
+                # the workers checked the hashes after the first one, they are not calculated again
+                block = self.__create_block(block_data, previous_block, parallel and height > 0)
+                if block.hash != block_data["hash"]:
+                    return False
+                if previous_block and not block.is_proof_valid():
+                    return False
+                created.append(block)
+                # the snapshot stands for the signatures and balances up to it, not for the hashes
+                if height > checkpoint and block.version >= 2:
+                    transactions.extend(
+                        transaction
+                        for transaction in block.transactions
+                        if isinstance(transaction, TransactionUser)
+                    )
+            previous_block = block
+        # the signatures of all the new blocks are checked as one batch
+        if not self.__verifier.verify(transactions):
+            return False
+        for block in created:
+            self.__tree.add(block)
+        return True
+
     def update_chain(self, data: dict) -> None:
         """method to update the chain"""
-        self.__chain = []
-        previous_block = None
-        for block_data in data["chain"]:
-            transactions = self.__create_transactions(block_data["transactions"])
-            block = Block(
-                transactions,
-                datetime.datetime.strptime(block_data["timestamp"], "%Y-%m-%d %H:%M:%S.%f"),
-                previous_block,
-                block_data["magic_number"],
-            )
+        with self.__lock:
+            self.__update_chain(data)
+            self.__publish(chain=True)
+
+    def __update_chain(self, data: dict) -> None:
+        """method to replace the blocks after the fork in the working state of the writer"""
+        fork = self.common_prefix(data["chain"])
+        checkpoint = self.__checkpoint_height(data["chain"])
+        # the balances start over from the snapshot when the fork is below it
+        rebuild = fork == 0 or checkpoint >= fork
+        if rebuild:
+            self.__balances = dict(self.__checkpoint["balances"]) if checkpoint >= fork else {}
+        # only the blocks after the fork change, the shared blocks are kept
+        detached = self.__detach(fork, not rebuild)
+        previous_block = self.__chain[-1] if self.__chain else None
+        for height in range(fork, len(data["chain"])):
+            block_data = data["chain"][height]
+            block = self.__validated_block(block_data, previous_block)
+            if not block:
+                block = self.__create_block(block_data, previous_block)
             previous_block = block
-            self.__chain.append(block)
-        self.__mempool = self.__create_transactions(data["mempool"])
+            self.__append_block(block, height > checkpoint)
+        self.__merge_mempool(data["mempool"], fork, detached)
+        self.__save_snapshot()
+
+    def __find_block(self, hash: str) -> Block:
+        """method to get a validated block of any branch by hash, None if it is unknown"""
+        height = self.__heights.get(hash)
+        if height is not None:
+            return self.__chain[height]
+        return self.__tree.get(hash)
+
+    def __detach(self, fork: int, revert: bool = True) -> List[Block]:
+        """method to remove the blocks after the fork from the chain, they become a side branch"""
+        detached = self.__chain[fork:]
+        for height in range(len(self.__chain) - 1, fork - 1, -1):
+            block = self.__chain[height]
+            if revert:
+                self.__apply_block(block, -1)
+            del self.__heights[block.hash]
+            self.__unindex_block(block, height)
+        self.__chain = self.__chain[:fork]
+        if self.__store is not None:
+            self.__store.truncate(fork)
+        # a chain with another genesis block shares nothing, its blocks are not kept
+        if not fork:
+            return []
+        for block in detached:
+            self.__tree.add(block)
+        return detached
+
+    def __merge_mempool(self, mempool: List[dict], fork: int, detached: List[Block]) -> None:
+        """method to take a received mempool with the local transactions the chain does not have"""
+        # the local transactions and the ones of the dropped blocks stay if they are not confirmed
+        kept = [
+            transaction
+            for transaction in self.__mempool
+            if isinstance(transaction, TransactionUser)
+        ] + [
+            Transaction.from_dict(
+                {**transaction.to_dict(), "status": Transaction.Status.PENDING.value}
+            )
+            for block in detached
+            for transaction in block.transactions
+            if isinstance(transaction, TransactionUser)
+        ]
+        self.__set_mempool(self.__signed(self.__create_transactions(mempool)) + kept)
+        self.__remove_from_mempool(
+            transaction.id for block in self.__chain[fork:] for transaction in block.transactions
+        )
+
+    def add_blocks(self, blocks: List[dict], mempool: List[dict] = ()) -> Blockchain.Outcome:
+        """method to add received blocks of any branch, moving to the branch with the most work"""
+        with self.__lock:
+            sent = {block_data["hash"] for block_data in blocks}
+            created: Dict[str, Block] = {}
+            orphan = False
+            queue = list(blocks)
+            # the queue grows with the orphans whose parent is one of the new blocks
+            for block_data in queue:
+                if block_data["hash"] in created or self.__find_block(block_data["hash"]):
+                    continue
+                parent = created.get(block_data["previous_block"]) or self.__find_block(
+                    block_data["previous_block"]
+                )
+                if parent is None:
+                    self.__tree.add_orphan(block_data)
+                    orphan = True
+                    continue
+                block = self.__create_block(block_data, parent)
+                if block.hash == block_data["hash"] and block.is_proof_valid():
+                    created[block.hash] = block
+                    queue.extend(self.__tree.take_orphans(block.hash))
+                elif block_data["hash"] in sent:
+                    return Blockchain.Outcome.INVALID
+                else:
+                    # an invalid orphan came from someone else, it is dropped with its children
+                    self.__tree.drop_orphans(block_data["hash"])
+            invalid = self.__invalid_signatures(created.values())
+            if invalid & sent:
+                return Blockchain.Outcome.INVALID
+            for hash in invalid:
+                self.__tree.drop_orphans(hash)
+            for block in created.values():
+                # the parents come first, so the children of a dropped orphan follow it out
+                if block.hash in invalid or block.previous_block.hash in invalid:
+                    invalid.add(block.hash)
+                else:
+                    self.__tree.add(block)
+            tip = max(
+                (block for block in created.values() if block.hash not in invalid),
+                key=lambda block: block.chain_work,
+                default=None,
+            )
+            # a branch with the same work as the chain does not replace it, the first one seen wins
+            if tip is None or tip.chain_work <= self.__chain[-1].chain_work:
+                return Blockchain.Outcome.ORPHAN if orphan else Blockchain.Outcome.STORED
+            if not self.__reorganize(tip, mempool):
+                return Blockchain.Outcome.INVALID
+            self.__save_snapshot()
+            self.__publish(chain=True)
+            return Blockchain.Outcome.ADOPTED
+
+    def __invalid_signatures(self, blocks: Iterable[Block]) -> Set[str]:
+        """method to get the hashes of the blocks with an invalid signature, checked in one batch"""
+        owners = []
+        transactions = []
+        for block in blocks:
+            if block.version < 2:
+                continue
+            for transaction in block.transactions:
+                if isinstance(transaction, TransactionUser):
+                    owners.append(block.hash)
+                    transactions.append(transaction)
+        checks = self.__verifier.verify_each(transactions)
+        return {hash for hash, valid in zip(owners, checks) if not valid}
+
+    def __reorganize(self, tip: Block, mempool: List[dict]) -> bool:
+        """method to make the branch of a block the chain, False if it shares no block with it"""
+        branch = []
+        while tip is not None and tip.hash not in self.__heights:
+            branch.append(tip)
+            tip = tip.previous_block
+        # a branch from another genesis block is never the chain
+        if tip is None:
+            return False
+        fork = self.__heights[tip.hash] + 1
+        detached = self.__detach(fork)
+        for block in reversed(branch):
+            self.__append_block(block)
+        self.__merge_mempool(mempool, fork, detached)
+        return True
 
-    def update_mempool(self, data: dict) -> None:
-        """method to update the mempool"""
-        self.__mempool.append(self.__create_transaction(data))
+    def __signed(self, transactions: List[Transaction]) -> List[Transaction]:
+        """method to drop the user transactions whose signature is not valid"""
+        users = [
+            transaction for transaction in transactions if isinstance(transaction, TransactionUser)
+        ]
+        checks = iter(self.__verifier.verify_each(users))
+        return [
+            transaction
+            for transaction in transactions
+            if not isinstance(transaction, TransactionUser) or next(checks)
+        ]
+
+    def update_mempool(self, data: dict) -> bool:
+        """method to update the mempool, returns False if the transaction is known or not signed"""
+        transaction = self.__create_transaction(data)
+        # rewards come from mining or with a chain, a lone one is never evicted so it is refused
+        if not isinstance(transaction, TransactionUser):
+            return False
+        if transaction.id in self.__mempool or not self.__signed([transaction]):
+            return False
+        with self.__lock:
+            if not self.__add_to_mempool(transaction):
+                return False
+            self.__publish()
+        return True
 
-    def generate_key(self, seed_phrase: str) -> str:
-        """method to generate public"""
+    @staticmethod
+    def signing_key(seed_phrase: str) -> SigningKey:
+        """method to derive the private key of a seed phrase"""
         private_key_bytes = hashlib.sha256(seed_phrase.encode()).digest()
         # cspell: disable-next-line
-        sk = SigningKey.from_string(private_key_bytes, curve=SECP256k1)
+        return SigningKey.from_string(private_key_bytes, curve=SECP256k1)
+
+    def generate_key(self, seed_phrase: str) -> str:
+        """method to generate public"""
+        sk = self.signing_key(seed_phrase)
         vk = sk.verifying_key
         compressed_public_key = vk.to_string("compressed").hex()
 
@@ -389,17 +1979,139 @@ class Blockchain:
 
     def to_dict(self) -> dict:
         """method to return a dictionary with the blockchain data"""
-        return {
-            "chain": [block.to_dict() for block in self.chain],
-            "length": len(self.chain),
-            "mempool": [transaction.to_dict() for transaction in self.mempool],
-        }
+        return self.__state.to_dict()
 
     def __str__(self):
         """method to return a string with the blockchain data"""
         return json.dumps(self.to_dict(), indent=4)
 
 
+class HeaderChain:
+    """class for the block headers and the proven transactions of a light client"""
+
+    def __init__(self) -> None:
+        """constructor method for HeaderChain class"""
+        self.__headers: List[dict] = []
+        self.__heights: Dict[str, int] = {}
+        # work of the chain up to each header, the branch with the most work is followed
+        self.__work: List[int] = []
+        # proven transactions by id, with the hash of the block that confirms them
+        self.__transactions: Dict[str, Tuple[str, Transaction]] = {}
+
+    def __len__(self) -> int:
+        """method to return the number of headers"""
+        return len(self.__headers)
+
+    @property
+    def tip(self) -> dict:
+        """getter method for the last header, None if there are no headers"""
+        return self.__headers[-1] if self.__headers else None
+
+    @property
+    def work(self) -> int:
+        """getter method for the work of the headers, 0 if there are none"""
+        return self.__work[-1] if self.__work else 0
+
+    @staticmethod
+    def work_of(headers: List[dict]) -> int:
+        """method to calculate the work of consecutive headers, a genesis one has no previous"""
+        return sum(
+            proof_work(
+                header.get("version", 1),
+                header.get("difficulty", DIFFICULTY),
+                header["previous_block"] is None,
+            )
+            for header in headers
+        )
+
+    @property
+    def transactions(self) -> List[Transaction]:
+        """getter method for the proven transactions"""
+        return [transaction for _, transaction in self.__transactions.values()]
+
+    def height(self, hash: str) -> int:
+        """method to get the height of a header, -1 if it is not in the chain"""
+        return self.__heights.get(hash, -1)
+
+    @staticmethod
+    def is_header_valid(header: dict, previous_header: dict) -> bool:
+        """method to check the link, hash and proof of work of a header"""
+        if header["previous_block"] != (previous_header["hash"] if previous_header else None):
+            return False
+        if header.get("version", 1) < 2:
+            # the hash of a version 1 block covers its transactions, only the link is checked
+            # but a block without proof can not continue a chain that already has one
+            return previous_header is None or previous_header.get("version", 1) < 2
+        hash = Block.calculate_hash(
+            Block.pack_header(
+                header["version"],
+                header["previous_block"],
+                header["merkle_root"],
+                parse_timestamp(header["timestamp"]),
+                header["difficulty"],
+                header["magic_number"],
+            )
+        )
+        if hash != header["hash"]:
+            return False
+        # the genesis block is not mined
+        return previous_header is None or (
+            header["difficulty"] >= DIFFICULTY and hash.startswith("0" * header["difficulty"])
+        )
+
+    def update(self, headers: List[dict]) -> int:
+        """method to add headers that continue a known one, returns the first new height or -1"""
+        if not headers:
+            return -1
+        previous_hash = headers[0]["previous_block"]
+        start = self.height(previous_hash) + 1 if previous_hash else 0
+        if previous_hash and start == 0:
+            return -1
+        work = (self.__work[start - 1] if start else 0) + self.work_of(headers)
+        # a branch with the same work does not replace the headers, the first one seen wins
+        if work <= self.work:
+            return -1
+        previous_header = self.__headers[start - 1] if start else None
+        for header in headers:
+            if not self.is_header_valid(header, previous_header):
+                return -1
+            previous_header = header
+        for header in self.__headers[start:]:
+            del self.__heights[header["hash"]]
+        del self.__headers[start:]
+        del self.__work[start:]
+        for header in headers:
+            self.__heights[header["hash"]] = len(self.__headers)
+            self.__headers.append(header)
+            self.__work.append(self.work + self.work_of([header]))
+        # the transactions of the replaced headers are no longer confirmed
+        self.__transactions = {
+            id: item for id, item in self.__transactions.items() if item[0] in self.__heights
+        }
+        return start
+
+    def add_proof(self, proof: dict) -> bool:
+        """method to keep a transaction whose merkle proof matches a header, False if not new"""
+        height = self.height(proof["block"])
+        if height < 0 or self.__headers[height].get("version", 1) < 2:
+            return False
+        transaction = Transaction.from_dict(proof["transaction"])
+        root = self.__headers[height]["merkle_root"]
+        if not MerkleTree.verify(transaction.digest, proof["index"], proof["proof"], root):
+            return False
+        new = transaction.id not in self.__transactions
+        self.__transactions[transaction.id] = (proof["block"], transaction)
+        return new
+
+    def balance(self, public_key: str) -> float:
+        """method to get the confirmed balance of an address from its proven transactions"""
+        balances: Dict[str, float] = {}
+        for transaction in self.transactions:
+            if transaction.status == Transaction.Status.CONFIRMED:
+                Blockchain.apply_transaction(balances, transaction)
+        return balances.get(public_key, 0)
+
+
 if __name__ == "__main__":
     blockchain = Blockchain()
     # cspell: disable-next-line
@@ -408,22 +2120,24 @@ if __name__ == "__main__":
     # cspell: disable-next-line
     public_key2 = blockchain.generate_key("FEWGW")
     print("Public key: " + public_key2)
+    # cspell: disable-next-line
+    signing_key1, signing_key2 = Blockchain.signing_key("ITAM"), Blockchain.signing_key("FEWGW")
 
-    blockchain.create_transaction(public_key1, public_key2, 1)
-    blockchain.create_transaction(public_key1, public_key2, 2)
-    blockchain.create_transaction(public_key1, public_key2, 3)
+    blockchain.create_transaction(public_key1, public_key2, 1, signing_key1)
+    blockchain.create_transaction(public_key1, public_key2, 2, signing_key1)
+    blockchain.create_transaction(public_key1, public_key2, 3, signing_key1)
 
     status = Block.StatusHolder()
     status.Mining()
     blockchain.mine_block(public_key1, status)
-    blockchain.create_transaction(public_key2, public_key1, 2)
+    blockchain.create_transaction(public_key2, public_key1, 2, signing_key2)
     status.Mining()
     blockchain.mine_block(public_key2, status)
     print(blockchain.get_balance(public_key1))
     print(blockchain.get_balance(public_key2))
 
-    blockchain.create_transaction(public_key1, public_key2, 2)
-    blockchain.create_transaction(public_key1, public_key2, 3)
+    blockchain.create_transaction(public_key1, public_key2, 2, signing_key1)
+    blockchain.create_transaction(public_key1, public_key2, 3, signing_key1)
     status.Mining()
     blockchain.mine_block(public_key1, status)
 
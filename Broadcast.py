@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List
+
+import requests
+
+
+class SeenSet:
+    """class for a bounded set of recently seen identifiers that forgets the oldest ones"""
+
+    def __init__(self, size: int = 10_000) -> None:
+        """constructor method for SeenSet class"""
+        self.__size: int = size
+        self.__items: OrderedDict[str, object] = OrderedDict()
+        self.__lock: threading.Lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        """method to check if an identifier was seen"""
+        return key in self.__items
+
+    def __len__(self) -> int:
+        """method to return how many identifiers are remembered"""
+        return len(self.__items)
+
+    def add(self, key: str, value: object = None) -> bool:
+        """method to remember an identifier, returns False if it was already seen"""
+        with self.__lock:
+            new = key not in self.__items
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            if len(self.__items) > self.__size:
+                self.__items.popitem(last=False)
+            return new
+
+    def get(self, key: str) -> object:
+        """method to get the value stored with an identifier"""
+        return self.__items.get(key)
+
+
+class Broadcaster:
+    """class to deliver messages to the nodes of the network in the background"""
+
+    class Peer:
+        """class with the connection, the queued messages and the delivery statistics of a node"""
+
+        def __init__(self) -> None:
+            """constructor method for Peer class"""
+            self.__session: requests.Session = requests.Session()
+            self.__lock: threading.Lock = threading.Lock()
+            # messages waiting for the node in order, a single worker at a time sends them
+            self.__queue: Deque[tuple] = deque()
+            self.__sending: bool = False
+            self.__delivered: int = 0
+            self.__failed: int = 0
+            self.__retries: int = 0
+            self.__latency: float = 0.0
+            self.__binary: bool = True
+
+        @property
+        def binary(self) -> bool:
+            """getter method for binary, False once the node rejected the binary format"""
+            return self.__binary
+
+        def use_json(self) -> None:
+            """method to send json to the node from now on"""
+            self.__binary = False
+
+        @property
+        def session(self) -> requests.Session:
+            """getter method for session"""
+            return self.__session
+
+        def push(self, message: tuple) -> bool:
+            """method to queue a message, returns True if a worker has to start sending"""
+            with self.__lock:
+                self.__queue.append(message)
+                if self.__sending:
+                    return False
+                self.__sending = True
+                return True
+
+        def retry(self, message: tuple) -> None:
+            """method to put a message back at the front of the queue"""
+            with self.__lock:
+                self.__queue.appendleft(message)
+
+        def pop(self) -> tuple:
+            """method to take the next message, None when the queue is empty and sending stops"""
+            with self.__lock:
+                if self.__queue:
+                    return self.__queue.popleft()
+                self.__sending = False
+                return None
+
+        def drop(self) -> List[tuple]:
+            """method to take every queued message out of the queue"""
+            with self.__lock:
+                messages = list(self.__queue)
+                self.__queue.clear()
+                return messages
+
+        def record(self, delivered: bool, retries: int, latency: float = 0.0) -> None:
+            """method to record the result of a delivery"""
+            self.__retries += retries
+            if delivered:
+                self.__delivered += 1
+                self.__latency = latency
+            else:
+                self.__failed += 1
+
+        def to_dict(self) -> dict:
+            """method to return a dictionary with the delivery statistics"""
+            return {
+                "delivered": self.__delivered,
+                "failed": self.__failed,
+                "retries": self.__retries,
+                "latency": self.__latency,
+                "queued": len(self.__queue),
+            }
+
+    def __init__(
+        self,
+        workers: int = 8,
+        timeout: float = 5,
+        retries: int = 3,
+        backoff: float = 0.2,
+        encoder: Callable[[dict], bytes] = None,
+        content_type: str = None,
+    ) -> None:
+        """constructor method for Broadcaster class, encoder gives the preferred body format"""
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers)
+        self.__timeout: float = timeout
+        self.__retries: int = retries
+        self.__backoff: float = backoff
+        self.__encoder: Callable[[dict], bytes] = encoder
+        self.__content_type: str = content_type
+        self.__peers: Dict[str, Broadcaster.Peer] = {}
+        self.__lock: threading.Lock = threading.Lock()
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """getter method for the delivery statistics of each node"""
+        with self.__lock:
+            return {url: peer.to_dict() for url, peer in self.__peers.items()}
+
+    def __peer(self, url: str) -> Broadcaster.Peer:
+        """method to get the connection of a node, creating it the first time"""
+        with self.__lock:
+            if url not in self.__peers:
+                self.__peers[url] = Broadcaster.Peer()
+            return self.__peers[url]
+
+    def send(
+        self,
+        url: str,
+        path: str,
+        data: dict,
+        callback: Callable[[requests.Response], None] = None,
+    ) -> Future:
+        """method to queue a message for a node and return without waiting for it"""
+        peer = self.__peer(url)
+        future = Future()
+        if peer.push((path, data, callback, future, 0)):
+            self.__resume(url, peer)
+        return future
+
+    def __resume(self, url: str, peer: Broadcaster.Peer) -> None:
+        """method to give the queue of a node to a worker"""
+        try:
+            self.__executor.submit(self.__drain, url, peer)
+        except RuntimeError:
+            # the broadcaster was shut down while the node was backing off
+            message = peer.pop()
+            while message is not None:
+                message[3].set_result(None)
+                message = peer.pop()
+
+    def __post(self, peer: Broadcaster.Peer, url: str, data: dict) -> requests.Response:
+        """method to post a message in the preferred format, falling back to json"""
+        if self.__encoder and peer.binary:
+            try:
+                body = self.__encoder(data)
+            except ValueError:
+                body = None
+            if body is not None:
+                response = peer.session.post(
+                    url,
+                    data=body,
+                    headers={"Content-Type": self.__content_type},
+                    timeout=self.__timeout,
+                )
+                if response.status_code != 415:
+                    return response
+                peer.use_json()
+        return peer.session.post(url, json=data, timeout=self.__timeout)
+
+    def __drain(self, url: str, peer: Broadcaster.Peer) -> None:
+        """method to send the queued messages of a node in order until the queue is empty"""
+        while True:
+            message = peer.pop()
+            if message is None:
+                return
+            path, data, callback, future, attempt = message
+            start = time.monotonic()
+            try:
+                response = self.__post(peer, f"http://{url}{path}", data)
+            except requests.RequestException:
+                response = None
+            delivered = response is not None and response.status_code < 500
+            if not delivered and attempt < self.__retries:
+                # the worker is not kept while the node backs off, a timer queues the retry
+                peer.retry((path, data, callback, future, attempt + 1))
+                timer = threading.Timer(self.__backoff * 2**attempt, self.__resume, (url, peer))
+                timer.daemon = True
+                timer.start()
+                return
+            peer.record(delivered, attempt, time.monotonic() - start)
+            if not delivered:
+                # the node is down, the messages behind this one are dropped instead of retried
+                for _, _, _, dropped, _ in peer.drop():
+                    peer.record(False, 0)
+                    dropped.set_result(None)
+            try:
+                if delivered and callback:
+                    callback(response)
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                future.set_result(response)
+
+    def shutdown(self) -> None:
+        """method to deliver the queued messages and close the connections"""
+        self.__executor.shutdown(wait=True)
+        with self.__lock:
+            for peer in self.__peers.values():
+                peer.session.close()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import hashlib
+import multiprocessing
+import os
+from typing import Optional
+
+# how many nonces a worker tries between checks of the stop event
+CHECK_INTERVAL = 4096
+# how often (in seconds) the caller checks if mining was cancelled
+POLL_INTERVAL = 0.05
+# size in bytes of the nonce at the end of a binary block header
+NONCE_SIZE = 8
+
+
+def target(difficulty: int) -> bytes:
+    """function to return the largest digest with difficulty leading hex zeros"""
+    return (16 ** (64 - difficulty) - 1).to_bytes(32, "big")
+
+
+def search_nonce(
+    prefix: bytes,
+    start: int,
+    step: int,
+    difficulty: int,
+    stop,
+    result,
+    binary: bool = True,
+) -> None:
+    """worker function to search the nonces start, start + step, start + 2 * step, ..."""
+    bound = target(difficulty)
+    midstate = hashlib.sha256(prefix)
+    nonce = start
+    checked = 0
+    while True:
+        hash = midstate.copy()
+        hash.update(nonce.to_bytes(NONCE_SIZE, "big") if binary else str(nonce).encode())
+        if hash.digest() <= bound:
+            with result.get_lock():
+                if result.value < 0:
+                    result.value = nonce
+            stop.set()
+            return
+        nonce += step
+        checked += 1
+        if checked >= CHECK_INTERVAL:
+            if stop.is_set():
+                return
+            checked = 0
+
+
+class MiningEngine:
+    """class to mine blocks using one process per core"""
+
+    def __init__(self, workers: int = None) -> None:
+        """constructor method for MiningEngine class"""
+        self.__workers: int = workers or os.cpu_count() or 1
+
+    @property
+    def workers(self) -> int:
+        """getter method for workers"""
+        return self.__workers
+
+    def mine(
+        self, prefix: bytes, difficulty: int, status, start: int = 1, binary: bool = True
+    ) -> Optional[int]:
+        """method to find a nonce whose hash meets the difficulty, None if mining was stopped"""
+        context = multiprocessing.get_context()
+        stop = context.Event()
+        result = context.Value("q", -1)
+        processes = [
+            context.Process(
+                target=search_nonce,
+                args=(prefix, start + i, self.__workers, difficulty, stop, result, binary),
+                daemon=True,
+            )
+            for i in range(self.__workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            # waiting on the event releases the GIL so the P2P thread keeps serving requests
+            while not stop.wait(POLL_INTERVAL):
+                if not status.status:
+                    break
+        finally:
+            stop.set()
+            for process in processes:
+                process.join()
+        if result.value < 0:
+            return None
+        return result.value
@@ -1,12 +1,36 @@
+import json
 import socket
+import struct
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from enum import Enum
-from typing import Set, Tuple
-from wsgiref.simple_server import make_server
+from typing import Dict, Set, Tuple
 
 import requests
-from Blockchain import Blockchain
-from flask import Flask, request
+from Blockchain import PAGE_SIZE, Blockchain, ChainState, HeaderChain, Transaction
+from Broadcast import Broadcaster, SeenSet
+from flask import Flask, Response, request
+from Server import PooledWSGIServer, ResponseCache
+from Wire import CONTENT_TYPE, JSON_CONTENT_TYPE, Wire
+
+# seconds to wait for a single request to a node
+REQUEST_TIMEOUT = 5
+# seconds to wait for all the nodes when syncing the blockchain
+SYNC_BUDGET = 10
+MAX_SYNC_WORKERS = 8
+# how many block and transaction identifiers are remembered to avoid relaying them again
+SEEN_CACHE_SIZE = 10_000
+# threads serving requests and requests that may wait for one before getting a 503
+SERVER_WORKERS = 8
+SERVER_MAX_PENDING = 64
+# seconds a client may take to send a request or read the answer
+SERVER_TIMEOUT = 30
+# seconds to wait for the requests in progress when stopping
+SHUTDOWN_GRACE = 10
+# errors of an answer that is not in the expected format, the node that sent it is skipped
+MALFORMED_ERRORS = (KeyError, IndexError, TypeError, ValueError, AttributeError, struct.error)
+# a locator lists this many hashes below the tip, then it doubles the gap between them
+LOCATOR_DENSE = 10
 
 
 class UsersType(Enum):
@@ -27,16 +51,36 @@ class P2P:
         port: int = 80,
         proxy=None,
         type: UsersType = UsersType.SERVER,
+        light: bool = False,
+        workers: int = SERVER_WORKERS,
+        max_pending: int = SERVER_MAX_PENDING,
     ) -> None:
-        """P2P class constructor"""
+        """P2P class constructor, light nodes do not download blocks or transactions"""
         self.__proxy = proxy
+        self.__light: bool = light
         self.__public_key: str = public_key
         self.__blockchain: dict = blockchain
         self.__port: int = port
         self.__app: Flask = Flask(__name__)
         self.__nodes: Set[Tuple[str, str]] = set()
         self.__type: UsersType = type
-        self.__server = None
+        self.__server: PooledWSGIServer = None
+        self.__workers: int = workers
+        self.__max_pending: int = max_pending
+        # requests are served concurrently, the ones that change the blockchain take turns
+        self.__lock: threading.RLock = threading.RLock()
+        self.__broadcaster: Broadcaster = Broadcaster(
+            timeout=REQUEST_TIMEOUT, encoder=Wire.encode, content_type=CONTENT_TYPE
+        )
+        # seen transactions keep their data so they can be sent to the nodes that ask for them
+        self.__seen_blocks: SeenSet = SeenSet(SEEN_CACHE_SIZE)
+        self.__seen_transactions: SeenSet = SeenSet(SEEN_CACHE_SIZE)
+        # encoded blockchain answers, rebuilt only when the blockchain is replaced
+        self.__responses: ResponseCache = ResponseCache()
+        # ETag and data of the last whole blockchain downloaded from each node
+        self.__downloads: Dict[str, Tuple[str, dict]] = {}
+        # the last chain whose work was calculated, with its work
+        self.__work: Tuple[list, int] = (None, 0)
 
     @property
     def public_key(self) -> str:
@@ -48,6 +92,7 @@ class P2P:
         """getter method for the header"""
         return {
             "Content-Type": "application/json",
+            "Accept": f"{CONTENT_TYPE}, {JSON_CONTENT_TYPE}",
             "port": str(self.__port),
             "key": str(self.__public_key),
         }
@@ -55,80 +100,359 @@ class P2P:
     def connect_node(self) -> None:
         """method to connect to node in the network and receive the blockchain"""
         headers = self.header
-        response = requests.get("http://127.0.0.1:80/get_network", headers=headers)
+        response = requests.get(
+            "http://127.0.0.1:80/get_network", headers=headers, timeout=REQUEST_TIMEOUT
+        )
         if response.status_code == 200:
             nodes = response.json()
             for node in nodes:
                 node = dict(node)
                 self.add_node(node["url"], node["public_key"])
 
+    @staticmethod
+    def __response_data(response: requests.Response) -> dict:
+        """method to read the body of a response in the format the node answered with"""
+        if Wire.accepts(response.headers.get("Content-Type")):
+            return Wire.decode(response.content)
+        return response.json()
+
+    @staticmethod
+    def __request_data() -> dict:
+        """method to read the body of the current request in the format it was sent with"""
+        if Wire.accepts(request.content_type):
+            return Wire.decode(request.get_data())
+        return request.json
+
+    @staticmethod
+    def __respond(data: dict):
+        """method to answer in the binary format if the node accepts it, else in json"""
+        if Wire.accepts(request.headers.get("Accept")):
+            try:
+                return Response(Wire.encode(data), mimetype=CONTENT_TYPE)
+            except ValueError:
+                pass
+        return data
+
+    def __encode_json(self, blockchain: dict) -> bytes:
+        """method to encode a blockchain as compact json, from the cached blocks when it can"""
+        if self.__proxy:
+            encoded = self.__proxy.encode_blockchain(blockchain)
+            if encoded is not None:
+                return encoded
+        return json.dumps(blockchain, separators=(",", ":"), default=list).encode()
+
     def add_node(self, node: str, public_key: str) -> None:
         """method to add a node to the network"""
         dict_node = {"url": node, "public_key": public_key}
-        self.__nodes.add(tuple(dict_node.items()))
+        # the set is replaced, not changed, so requests iterating the old one are not disturbed
+        self.__nodes = self.__nodes | {tuple(dict_node.items())}
+
+    def __is_chain_valid(self, chain: list, parallel: bool = None) -> bool:
+        """method to check a chain, verifying only the blocks unknown to the local blockchain"""
+        if self.__proxy:
+            return self.__proxy.validate_chain(chain, parallel)
+        if parallel:
+            return Blockchain.is_chain_valid_parallel(chain)
+        return Blockchain.is_chain_valid(chain)
+
+    def __work_of(self, blockchain: dict) -> int:
+        """method to get the work of a blockchain, it is calculated again only for a new chain"""
+        chain, work = self.__work
+        if chain is not blockchain["chain"]:
+            chain = blockchain["chain"]
+            work = Blockchain.chain_work(chain)
+            self.__work = chain, work
+        return work
+
+    def __is_heavier(self, work: int, mempool: int, blockchain: dict) -> bool:
+        """method to check if a chain work and mempool size beat a blockchain"""
+        local_work = self.__work_of(blockchain)
+        return work > local_work or (work == local_work and mempool > len(blockchain["mempool"]))
 
     def __compare_blockchain(
-        self, length: int, blockchain: dict, max_length: int, longest_blockchain: dict
+        self, blockchain: dict, heaviest_blockchain: dict, parallel: bool = None
     ) -> bool:
-        """method to compare the current blockchain with the longest blockchain in the network"""
-        valid = Blockchain.is_chain_valid(blockchain["chain"])
-        bigger_chain = length > max_length
-        bigger_mempool = length == max_length and len(blockchain["mempool"]) > len(
-            longest_blockchain["mempool"]
+        """method to compare a blockchain with the one with the most work in the network"""
+        work = Blockchain.chain_work(blockchain["chain"])
+        if not self.__is_heavier(work, len(blockchain["mempool"]), heaviest_blockchain):
+            return False
+        return self.__is_chain_valid(blockchain["chain"], parallel)
+
+    @property
+    def tip(self) -> dict:
+        """getter method for the length, work and hash of the last block of the blockchain"""
+        blockchain = self.__blockchain
+        return {
+            "length": blockchain["length"],
+            "work": self.__work_of(blockchain),
+            "hash": blockchain["chain"][-1]["hash"],
+            "mempool": len(blockchain["mempool"]),
+        }
+
+    @staticmethod
+    def __find_height(chain: list, hash: str) -> int:
+        """method to find the height of a block hash searching from the tip, -1 if not found"""
+        for height in range(len(chain) - 1, -1, -1):
+            if chain[height]["hash"] == hash:
+                return height
+        return -1
+
+    @staticmethod
+    def __locator(chain: list) -> list[str]:
+        """method to list hashes from the tip down to the genesis block, sparser with depth"""
+        hashes, height, step = [], len(chain) - 1, 1
+        while height > 0:
+            hashes.append(chain[height]["hash"])
+            if len(hashes) >= LOCATOR_DENSE:
+                step *= 2
+            height -= step
+        hashes.append(chain[0]["hash"])
+        return hashes
+
+    @staticmethod
+    def __fork_height(chain: list, locator: list[str]) -> int:
+        """method to find the height of the highest block of a chain in a locator, -1 if none"""
+        hashes = set(locator)
+        for height in range(len(chain) - 1, -1, -1):
+            if chain[height]["hash"] in hashes:
+                return height
+        return -1
+
+    def __fetch_blockchain(self, url: str) -> dict:
+        """method to get the blockchain of a node downloading only the blocks after the fork"""
+        headers = self.header
+        chain = self.__blockchain["chain"]
+        response = requests.get(
+            f"http://{url}/get_blocks",
+            params={"locator": ",".join(self.__locator(chain))},
+            headers=headers,
+            timeout=REQUEST_TIMEOUT,
         )
-        return valid and (bigger_chain or bigger_mempool)
+        if response.status_code == 200:
+            data = self.__response_data(response)
+            if not data["chain"]:
+                return None
+            # the blocks continue the highest block of the locator that the node has
+            start = self.__find_height(chain, data["chain"][0]["previous_block"]) + 1
+            data["chain"] = chain[:start] + data["chain"]
+            return data
+        # the node shares no block with the local chain, so the whole chain is needed
+        download = self.__downloads.get(url)
+        if download:
+            headers = {**headers, "If-None-Match": download[0]}
+        response = requests.get(
+            f"http://{url}/get_blockchain", headers=headers, timeout=REQUEST_TIMEOUT
+        )
+        if response.status_code == 304 and download:
+            return download[1]
+        if response.status_code == 200:
+            data = self.__response_data(response)
+            if response.headers.get("ETag"):
+                self.__downloads[url] = response.headers["ETag"], data
+            return data
+        return None
 
-    # TODO: refactor this method
-    def replace_chain(self) -> dict:
-        """method to replace the current blockchain with the longest blockchain in the network"""
-        network = tuple(self.__nodes)
-        longest_blockchain = self.__blockchain
-        max_length = self.__blockchain["length"]
-        for node in network:
-            node_dict = dict(node)
-            headers = self.header
-            if node_dict["public_key"] == self.public_key:
+    def __poll_node(self, url: str) -> Tuple[Tuple[int, int], dict]:
+        """method to get the work, mempool size and blockchain of a node if it is ahead"""
+        try:
+            response = requests.get(
+                f"http://{url}/get_tip", headers=self.header, timeout=REQUEST_TIMEOUT
+            )
+            if response.status_code != 200:
+                return None
+            tip = response.json()
+            if not self.__is_heavier(tip["work"], tip["mempool"], self.__blockchain):
+                return None
+            blockchain = self.__fetch_blockchain(url)
+            if blockchain is None:
+                return None
+            chain, mempool = blockchain["chain"], blockchain["mempool"]
+            return (Blockchain.chain_work(chain), len(mempool)), blockchain
+        except (requests.RequestException, *MALFORMED_ERRORS):
+            # a node that does not answer or answers something else is unavailable
+            return None
+
+    def fetch_headers(self, from_hash: str = None, from_work: int = 0) -> Tuple[str, dict]:
+        """method to get the headers after a hash from the node with the most work"""
+        best_url, best, best_work = None, None, -1
+        for url in self.__peers():
+            try:
+                response = requests.get(
+                    f"http://{url}/get_headers",
+                    params={"from_hash": from_hash} if from_hash else {},
+                    headers=self.header,
+                    timeout=REQUEST_TIMEOUT,
+                )
+                if response.status_code == 404:
+                    # the node is on another branch, so all the headers are needed
+                    response = requests.get(
+                        f"http://{url}/get_headers", headers=self.header, timeout=REQUEST_TIMEOUT
+                    )
+            except requests.RequestException:
                 continue
-            url = node_dict["url"]
-            response = requests.get(f"http://{url}/get_blockchain", headers=headers)
-            if response.status_code == 200:
-                length = response.json()["length"]
-                blockchain = response.json()
-                if self.__compare_blockchain(length, blockchain, max_length, longest_blockchain):
-                    max_length = length
-                    longest_blockchain = blockchain
-        return self.__blockchain
-
-    def send_block(self, chain: dict) -> None:
-        """method to send the current blockchain to the network"""
-        self.__blockchain = chain
-        network = self.__nodes
-        for node in network:
-            node_dict = dict(node)
-            url = node_dict["url"]
-            if node_dict["public_key"] == self.__public_key:
+            if response.status_code != 200:
                 continue
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(
-                f"http://{url}/receive_blockchain", json=self.__blockchain, headers=headers
+            try:
+                data = response.json()
+                headers = data["headers"]
+                work = HeaderChain.work_of(headers)
+                # headers after the hash continue the ones with from_work
+                if from_hash and headers and headers[0]["previous_block"] == from_hash:
+                    work += from_work
+            except MALFORMED_ERRORS:
+                # a node that answers something else is skipped
+                continue
+            if work > best_work:
+                best_url, best, best_work = url, data, work
+        return best_url, best
+
+    def fetch_proofs(self, url: str, public_key: str, from_height: int = 0) -> list:
+        """method to get from a node the merkle proofs of the transactions of an address"""
+        try:
+            response = requests.get(
+                f"http://{url}/get_proofs",
+                params={"key": public_key, "from_height": from_height},
+                headers=self.header,
+                timeout=REQUEST_TIMEOUT,
             )
+        except requests.RequestException:
+            return []
+        if response.status_code != 200:
+            return []
+        try:
+            proofs = response.json()["proofs"]
+        except MALFORMED_ERRORS:
+            return []
+        return proofs if isinstance(proofs, list) else []
+
+    def replace_chain(self, parallel: bool = None) -> dict:
+        """method to replace the current blockchain with the longest blockchain in the network"""
+        urls = [
+            dict(node)["url"]
+            for node in self.__nodes
+            if dict(node)["public_key"] != self.public_key
+        ]
+        if not urls:
+            return self.__blockchain
+        # every node is polled at once, the ones that miss the budget are ignored
+        executor = ThreadPoolExecutor(max_workers=min(MAX_SYNC_WORKERS, len(urls)))
+        futures = [executor.submit(self.__poll_node, url) for url in urls]
+        done, _ = wait(futures, timeout=SYNC_BUDGET)
+        executor.shutdown(wait=False, cancel_futures=True)
+        polled = [future.result() for future in done if future.result()]
+        polled.sort(key=lambda item: item[0], reverse=True)
+        with self.__lock:
+            for _, blockchain in polled:
+                try:
+                    heavier = self.__compare_blockchain(blockchain, self.__blockchain, parallel)
+                except MALFORMED_ERRORS:
+                    continue
+                if heavier:
+                    self.__blockchain = blockchain
+                    break
+            return self.__blockchain
+
+    @property
+    def delivery_stats(self) -> dict:
+        """getter method for the delivery statistics of each node"""
+        return self.__broadcaster.stats
+
+    @property
+    def server_stats(self) -> dict:
+        """getter method for the served, rejected and active connections of the server"""
+        return self.__server.stats if self.__server else {}
+
+    def __peers(self) -> list[str]:
+        """method to get the urls of the other nodes in the network"""
+        return [
+            dict(node)["url"]
+            for node in self.__nodes
+            if dict(node)["public_key"] != self.__public_key
+        ]
+
+    def __has_block(self, hash: str) -> bool:
+        """method to check if a block is already known"""
+        if hash in self.__seen_blocks:
+            return True
+        if self.__proxy:
+            return self.__proxy.has_block(hash)
+        return self.__find_height(self.__blockchain["chain"], hash) >= 0
+
+    def __deliver_blocks(self, url: str, blocks: list) -> None:
+        """method to send blocks to a node, resending from its tip if it misses some"""
+        blockchain = self.__blockchain
+        data = {
+            "chain": blocks,
+            "length": blockchain["length"],
+            "mempool": list(blockchain["mempool"]),
+        }
+        chain = blockchain["chain"]
+
+        def delivered(response: requests.Response) -> None:
+            """callback to report the blocks the node took"""
             if response.status_code == 200:
                 print("blockchain sent")
 
-    def send_transaction(self, transaction: dict) -> None:
-        """method to send a transaction to the network"""
-        network = self.__nodes
-        for node in network:
-            node_dict = dict(node)
-            url = node_dict["url"]
-            if node_dict["public_key"] == self.__public_key:
-                continue
-            headers = {"Content-Type": "application/json"}
-            response = requests.post(
-                f"http://{url}/receive_transaction", json=transaction, headers=headers
+        def resend(response: requests.Response) -> None:
+            """callback to send the blocks from the last one the node has if it misses some"""
+            if response.status_code != 409:
+                delivered(response)
+                return
+            tip = response.json()
+            locator = tip.get("locator") or [tip["hash"]]
+            missing = {**data, "chain": chain[self.__fork_height(chain, locator) + 1 :]}
+            self.__broadcaster.send(url, "/receive_blocks", missing, delivered)
+
+        # the answers come back in the queue of the node, no worker waits for them
+        self.__broadcaster.send(url, "/receive_blocks", data, resend)
+
+    def __send_wanted(self, url: str, response: requests.Response) -> None:
+        """method to send the announced items that a node asked for"""
+        if response.status_code != 200:
+            return
+        wanted = response.json()
+        for id in wanted["transactions"]:
+            transaction = self.__seen_transactions.get(id)
+            if transaction:
+                self.__broadcaster.send(url, "/receive_transaction", transaction)
+        chain = self.__blockchain["chain"]
+        heights = [self.__find_height(chain, hash) for hash in wanted["blocks"]]
+        heights = [height for height in heights if height >= 0]
+        if heights:
+            self.__deliver_blocks(url, chain[min(heights) :])
+
+    def __announce(self, blocks: list[str] = (), transactions: list[str] = ()) -> None:
+        """method to announce block hashes and transaction ids to the other nodes"""
+        inventory = {"blocks": list(blocks), "transactions": list(transactions)}
+        for url in self.__peers():
+            self.__broadcaster.send(
+                url,
+                "/inv",
+                inventory,
+                lambda response, url=url: self.__send_wanted(url, response),
             )
-            if response.status_code == 200:
-                pass
+
+    def send_block(self, state: ChainState) -> None:
+        """method to announce the new block of a published state of the blockchain to the network"""
+        self.update_blockchain(state)
+        hash = state.dicts[-1]["hash"]
+        self.__seen_blocks.add(hash)
+        self.__announce(blocks=[hash])
+
+    def update_blockchain(self, state: ChainState) -> None:
+        """method to replace the blockchain sent to the network with a published state"""
+        # built whole from one state, a newer chain is never mixed with an older mempool or back
+        self.__blockchain = {
+            "chain": list(state.dicts),
+            "length": len(state.blocks),
+            "mempool": state.mempool,
+        }
+
+    def send_transaction(self, transaction: dict) -> None:
+        """method to announce a transaction to the network"""
+        id = Transaction.from_dict(transaction).id
+        self.__seen_transactions.add(id, transaction)
+        self.__announce(transactions=[id])
 
     def validate_connection(self) -> bool:
         """method to validate if the current node is connected to the network"""
@@ -169,17 +493,182 @@ class P2P:
                 data.append(dict_node)
             return data
 
+    def __register_sender(self) -> None:
+        """method to add the node that made the current request to the network"""
+        headers = request.headers
+        public_keys = self.__get_public_keys()
+        if headers["key"] not in public_keys:
+            self.add_node(f"{request.remote_addr}:{headers['port']}", headers["key"])
+
     def get_blockchain(self) -> None:
         """method to get the blockchain"""
 
         @self.__app.route("/get_blockchain", methods=["GET"])
         def get_blockchain_route() -> dict:
-            """route to get the blockchain"""
-            headers = request.headers
-            public_keys = self.__get_public_keys()
-            if headers["key"] not in public_keys:
-                self.add_node(f"{request.remote_addr}:{headers['port']}", headers["key"])
-            return self.__blockchain
+            """route to get the blockchain, answering 304 when the ETag has not changed"""
+            self.__register_sender()
+            blockchain = self.__blockchain
+            compress = "gzip" in request.headers.get("Accept-Encoding", "")
+            body = None
+            if Wire.accepts(request.headers.get("Accept")):
+                try:
+                    body, etag = self.__responses.get(
+                        blockchain, CONTENT_TYPE, Wire.encode, compress
+                    )
+                    mimetype = CONTENT_TYPE
+                except ValueError:
+                    pass
+            if body is None:
+                body, etag = self.__responses.get(
+                    blockchain, JSON_CONTENT_TYPE, self.__encode_json, compress
+                )
+                mimetype = JSON_CONTENT_TYPE
+            headers = {"ETag": f'"{etag}"', "Vary": "Accept, Accept-Encoding"}
+            if request.if_none_match.contains(etag):
+                return Response(status=304, headers=headers)
+            if compress:
+                headers["Content-Encoding"] = "gzip"
+            return Response(body, mimetype=mimetype, headers=headers)
+
+    def get_tip(self) -> None:
+        """method to get the tip of the blockchain"""
+
+        @self.__app.route("/get_tip", methods=["GET"])
+        def get_tip_route() -> dict:
+            """route to get the length and hash of the last block"""
+            self.__register_sender()
+            return self.tip
+
+    def get_blocks(self) -> None:
+        """method to get the blocks from a height or after a hash"""
+
+        @self.__app.route("/get_blocks", methods=["GET"])
+        def get_blocks_route() -> dict:
+            """route to get the blocks from from_height, after from_hash or after a locator"""
+            self.__register_sender()
+            # one reference keeps the blocks, length and mempool of the answer consistent
+            blockchain = self.__blockchain
+            chain = blockchain["chain"]
+            if "locator" in request.args:
+                start = self.__fork_height(chain, request.args["locator"].split(",")) + 1
+                if start == 0:
+                    return self.tip, 404
+            elif "from_hash" in request.args:
+                start = self.__find_height(chain, request.args["from_hash"]) + 1
+                if start == 0:
+                    return self.tip, 404
+            else:
+                start = request.args.get("from_height", 0, type=int)
+            return self.__respond(
+                {
+                    "chain": chain[start:],
+                    "length": blockchain["length"],
+                    "mempool": list(blockchain["mempool"]),
+                }
+            )
+
+    def get_headers(self) -> None:
+        """method to get the block headers from a height or after a hash"""
+
+        @self.__app.route("/get_headers", methods=["GET"])
+        def get_headers_route() -> dict:
+            """route to get the headers from the height from_height or after the hash from_hash"""
+            self.__register_sender()
+            blockchain = self.__blockchain
+            chain = blockchain["chain"]
+            if "from_hash" in request.args:
+                start = self.__find_height(chain, request.args["from_hash"]) + 1
+                if start == 0:
+                    return self.tip, 404
+            else:
+                start = request.args.get("from_height", 0, type=int)
+            return {
+                "headers": [
+                    {key: value for key, value in block.items() if key != "transactions"}
+                    for block in chain[start:]
+                ],
+                "length": blockchain["length"],
+            }
+
+    def get_proofs(self) -> None:
+        """method to get the merkle proofs of the transactions of an address"""
+
+        @self.__app.route("/get_proofs", methods=["GET"])
+        def get_proofs_route() -> dict:
+            """route to get the proofs of the transactions of key from the height from_height"""
+            self.__register_sender()
+            if not self.__proxy:
+                return {"proofs": []}
+            from_height = request.args.get("from_height", 0, type=int)
+            return {"proofs": self.__proxy.proofs(request.args["key"], from_height)}
+
+    def get_block(self) -> None:
+        """method to get a block of the chain by hash or by height"""
+
+        @self.__app.route("/block/<hash>", methods=["GET"])
+        def get_block_route(hash: str):
+            """route to get a block by hash with its height and confirmations"""
+            block = self.__proxy.get_block(hash) if self.__proxy else None
+            return block if block else ("block not found", 404)
+
+        @self.__app.route("/block-height/<int:height>", methods=["GET"])
+        def get_block_at_route(height: int):
+            """route to get the block at a height with its confirmations"""
+            block = self.__proxy.get_block_at(height) if self.__proxy else None
+            return block if block else ("block not found", 404)
+
+    def get_transaction(self) -> None:
+        """method to get a transaction by id"""
+
+        @self.__app.route("/tx/<id>", methods=["GET"])
+        def get_transaction_route(id: str):
+            """route to get a transaction with the block that confirms it, if any"""
+            transaction = self.__proxy.get_transaction(id) if self.__proxy else None
+            return transaction if transaction else ("transaction not found", 404)
+
+    def get_history(self) -> None:
+        """method to get the transactions of an address"""
+
+        @self.__app.route("/address/<key>/history", methods=["GET"])
+        def get_history_route(key: str) -> dict:
+            """route to get a page of limit transactions of an address from the position start"""
+            if not self.__proxy:
+                return {"transactions": [], "total": 0, "next": None}
+            return self.__proxy.get_history(
+                key,
+                request.args.get("start", 0, type=int),
+                request.args.get("limit", PAGE_SIZE, type=int),
+            )
+
+    def inventory(self) -> None:
+        """method to receive the announcement of blocks and transactions"""
+
+        @self.__app.route("/inv", methods=["POST"])
+        def inventory_route() -> dict:
+            """route to answer which of the announced blocks and transactions are missing"""
+            inventory = self.__request_data()
+            if self.__light:
+                return {"blocks": [], "transactions": []}
+            return {
+                "blocks": [hash for hash in inventory["blocks"] if not self.__has_block(hash)],
+                "transactions": [
+                    id for id in inventory["transactions"] if id not in self.__seen_transactions
+                ],
+            }
+
+    def __adopt_blockchain(self, blockchain: dict = None) -> None:
+        """method to replace the blockchain with a received one, None if the proxy published it"""
+        if blockchain is not None:
+            self.__blockchain = blockchain
+        hash = self.__blockchain["chain"][-1]["hash"]
+        if self.__seen_blocks.add(hash):
+            self.__announce(blocks=[hash])
+        if self.__proxy:
+            if blockchain is not None:
+                self.__proxy.update_blockchain(blockchain)
+            if self.__type == UsersType.MINER:
+                self.__proxy.notify()
+        print("blockchain received")
 
     def receive_blockchain(self) -> None:
         """method to receive the blockchain"""
@@ -187,16 +676,55 @@ class P2P:
         @self.__app.route("/receive_blockchain", methods=["POST"])
         def receive_blockchain_route() -> str:
             """route to receive the blockchain"""
-            if self.__blockchain["length"] < request.json["length"] and Blockchain.is_chain_valid(
-                request.json["chain"]
-            ):
-                self.__blockchain = request.json
-                if self.__proxy:
-                    self.__proxy.update_blockchain(self.__blockchain)
-                    if self.__type == UsersType.MINER:
-                        self.__proxy.notify()
-                print("blockchain received")
-                return "blockchain received"
+            data = self.__request_data()
+            with self.__lock:
+                work = Blockchain.chain_work(data["chain"])
+                if self.__work_of(self.__blockchain) < work and self.__is_chain_valid(
+                    data["chain"]
+                ):
+                    self.__adopt_blockchain(data)
+                    return "blockchain received"
+            return "blockchain rejected"
+
+    def __missing_blocks(self) -> dict:
+        """method to answer blocks that continue an unknown block with a locator of the chain"""
+        return {**self.tip, "locator": self.__locator(self.__blockchain["chain"])}
+
+    def __receive_branch(self, data: dict):
+        """method to add received blocks to the block tree of the proxy"""
+        outcome = self.__proxy.receive_blocks(data)
+        if outcome == Blockchain.Outcome.ADOPTED:
+            self.__adopt_blockchain()
+            return "blockchain received"
+        if outcome == Blockchain.Outcome.STORED:
+            return "blocks stored"
+        if outcome == Blockchain.Outcome.ORPHAN:
+            return self.__missing_blocks(), 409
+        return "blockchain rejected"
+
+    def receive_blocks(self) -> None:
+        """method to receive the blocks missing in the blockchain"""
+
+        @self.__app.route("/receive_blocks", methods=["POST"])
+        def receive_blocks_route() -> str:
+            """route to receive blocks that continue a known block of any branch"""
+            data = self.__request_data()
+            with self.__lock:
+                if self.__proxy and data["chain"] and data["chain"][0]["previous_block"]:
+                    return self.__receive_branch(data)
+                chain = self.__blockchain["chain"]
+                start = 0
+                if data["chain"] and data["chain"][0]["previous_block"]:
+                    start = self.__find_height(chain, data["chain"][0]["previous_block"]) + 1
+                    if start == 0:
+                        return self.__missing_blocks(), 409
+                chain = chain[:start] + data["chain"]
+                work = Blockchain.chain_work(chain)
+                if self.__work_of(self.__blockchain) < work and self.__is_chain_valid(chain):
+                    self.__adopt_blockchain(
+                        {"chain": chain, "length": len(chain), "mempool": data["mempool"]}
+                    )
+                    return "blockchain received"
             return "blockchain rejected"
 
     def receive_transaction(self) -> None:
@@ -205,10 +733,24 @@ class P2P:
         @self.__app.route("/receive_transaction", methods=["POST"])
         def receive_transaction_route() -> str:
             """route to receive a transaction"""
-            transaction = request.json
-            self.__blockchain["mempool"].append(transaction)
+            transaction = self.__request_data()
+            # mining rewards travel with blocks and mempools, never on their own
+            if transaction.get("sender") == "ITcoin":
+                return "transaction rejected"
+            id = Transaction.from_dict(transaction).id
+            if id in self.__seen_transactions:
+                return "transaction already received"
+            with self.__lock:
+                # a rejected copy is not seen, so the id is still asked for when announced
+                if self.__proxy and not self.__proxy.update_transaction(transaction):
+                    return "transaction rejected"
+                if not self.__seen_transactions.add(id, transaction):
+                    return "transaction already received"
+                if not self.__proxy:
+                    mempool = [*self.__blockchain["mempool"], transaction]
+                    self.__blockchain = {**self.__blockchain, "mempool": mempool}
+            self.__announce(transactions=[id])
             if self.__proxy:
-                self.__proxy.update_transaction(transaction)
                 if self.__type == UsersType.USER or self.__type == UsersType.MINER:
                     if self.__public_key == transaction["receiver"]:
                         self.__proxy.notify(transaction)
@@ -228,7 +770,7 @@ class P2P:
                     node_to_remove = node
                     break
             if node_to_remove:
-                self.__nodes.remove(node_to_remove)
+                self.__nodes = self.__nodes - {node_to_remove}
                 return "node disconnected"
             else:
                 return "node not found"
@@ -244,13 +786,21 @@ class P2P:
                 continue
             url = node_dict["url"]
 
-            response = requests.delete(f"http://{url}/disconnect_node", headers=headers)
+            try:
+                response = requests.delete(
+                    f"http://{url}/disconnect_node", headers=headers, timeout=REQUEST_TIMEOUT
+                )
+            except requests.RequestException:
+                continue
             if response.status_code == 200:
                 print("node disconnected")
 
+        self.__broadcaster.shutdown()
         if self.__server:
+            # stop accepting connections, then let the requests in progress finish
             self.__server.shutdown()
             self.flask_thread.join()
+            self.__server.close(SHUTDOWN_GRACE)
 
     def run(self) -> None:
         """method to run the server"""
@@ -259,14 +809,29 @@ class P2P:
             """method to run the server in a thread"""
             self.__app = Flask(__name__)
             self.get_blockchain()
+            self.get_tip()
+            self.get_blocks()
+            self.get_headers()
+            self.get_proofs()
+            self.get_block()
+            self.get_transaction()
+            self.get_history()
             self.receive_blockchain()
+            self.receive_blocks()
+            self.inventory()
             self.get_network()
             self.receive_transaction()
             self.disconnect_node()
             # cspell: disable-next-line
             local_ip = socket.gethostbyname(socket.gethostname())
             self.add_node(node=f"{local_ip}:{self.__port}", public_key=self.__public_key)
-            self.__server = make_server("0.0.0.0", self.__port, self.__app)
+            self.__server = PooledWSGIServer(
+                ("0.0.0.0", self.__port),
+                self.__app,
+                self.__workers,
+                self.__max_pending,
+                SERVER_TIMEOUT,
+            )
             self.__server.serve_forever()
 
         self.flask_thread = threading.Thread(target=flask_thread)
@@ -1,8 +1,14 @@
 import threading
 from abc import ABC, abstractmethod
+from typing import Tuple
 
-from Blockchain import Block, Blockchain, Transaction
-from P2P import P2P, UsersType
+# cspell: disable-next-line
+from ecdsa import SigningKey
+
+from Analytics import ChainAnalytics
+from Blockchain import PAGE_SIZE, Block, Blockchain, HeaderChain, Transaction
+from P2P import MALFORMED_ERRORS, P2P, UsersType
+from Storage import BlockStore, SnapshotStore
 
 
 class Subscriber(ABC):
@@ -61,12 +67,23 @@ class Proxy(OperationsBlockchain, OperationsP2P):
         port: int = 80,
         subscriber: Subscriber = None,
         type=UsersType.SERVER,
+        data_dir: str = None,
+        light: bool = False,
     ) -> None:
-        """constructor of the class"""
-        self.__blockchain: Blockchain = Blockchain()
+        """constructor of the class, data_dir keeps the blockchain on disk, light only headers"""
+        data_dir = None if light else data_dir
+        self.__store: BlockStore = BlockStore(data_dir) if data_dir else None
+        self.__snapshots: SnapshotStore = SnapshotStore(data_dir) if data_dir else None
+        self.__blockchain: Blockchain = Blockchain(self.__store, self.__snapshots)
+        self.__headers: HeaderChain = HeaderChain() if light else None
         public_key = self.__blockchain.generate_key(private_key)
-        self.__p2p: P2P = P2P(public_key, self.__blockchain.to_dict(), port, self, type)
+        self.__signing_key: SigningKey = Blockchain.signing_key(private_key)
+        self.__p2p: P2P = P2P(public_key, self.__blockchain.to_dict(), port, self, type, light)
         self.__subscriber: Subscriber = subscriber
+        # the p2p server calls in from several threads, changes to the blockchain take turns
+        self.__lock: threading.RLock = threading.RLock()
+        # the last reports, the next ones add the new blocks to a copy while the chain only grows
+        self.__analytics: Tuple[int, Tuple[Block, ...], ChainAnalytics] = None
 
     @property
     def public_key(self) -> str:
@@ -90,19 +107,73 @@ class Proxy(OperationsBlockchain, OperationsP2P):
     def stop(self) -> None:
         """method to stop the node"""
         self.__p2p.stop()
+        if self.__store:
+            self.__store.close()
+            self.__snapshots.close()
 
     def validate_connection(self) -> bool:
         """method to validate if the node is connected to the network"""
         return self.__p2p.validate_connection()
 
-    def get_blockchain(self) -> None:
-        """method to get the blockchain from the network"""
+    def get_blockchain(self, parallel: bool = None) -> None:
+        """method to get the blockchain from the network, parallel selects the validation mode"""
+        if not self.validate_connection():
+            return
+        blockchain = self.__p2p.replace_chain(parallel)
+        with self.__lock:
+            state = self.__blockchain.state
+            # nothing new costs a comparison of the tips, not of the chains
+            if state.describes(blockchain):
+                return
+            if Blockchain.fingerprint_of(blockchain) == state.fingerprint:
+                return
+            self.__blockchain.update_chain(blockchain)
+            self.__p2p.update_blockchain(self.__blockchain.state)
+
+    def sync_headers(self) -> None:
+        """method to get the new headers and the proofs of the transactions of the node"""
         if not self.validate_connection():
             return
-        blockchain = self.__p2p.replace_chain()
-        if blockchain == self.__blockchain.to_dict():
+        tip = self.__headers.tip
+        url, data = self.__p2p.fetch_headers(tip["hash"] if tip else None, self.__headers.work)
+        if not url:
             return
-        self.__blockchain.update_chain(blockchain)
+        try:
+            start = self.__headers.update(data["headers"])
+        except MALFORMED_ERRORS:
+            # the node sent headers that can not be read, they are ignored
+            return
+        if start < 0:
+            return
+        for proof in self.__p2p.fetch_proofs(url, self.public_key, start):
+            try:
+                if not self.__headers.add_proof(proof) or not tip:
+                    continue
+                notify = proof["transaction"]["receiver"] == self.public_key
+            except MALFORMED_ERRORS:
+                continue
+            if notify:
+                self.notify(proof["transaction"])
+
+    def proofs(self, public_key: str, from_height: int = 0) -> list:
+        """method to get the merkle proofs of the transactions of a public key"""
+        return self.__blockchain.proofs(public_key, from_height)
+
+    def get_block(self, hash: str) -> dict:
+        """method to get a block of the chain by hash"""
+        return self.__blockchain.get_block(hash)
+
+    def get_block_at(self, height: int) -> dict:
+        """method to get the block of the chain at a height"""
+        return self.__blockchain.get_block_at(height)
+
+    def get_transaction(self, id: str) -> dict:
+        """method to get a confirmed or pending transaction by id"""
+        return self.__blockchain.get_transaction(id)
+
+    def get_history(self, public_key: str, start: int = 0, limit: int = PAGE_SIZE) -> dict:
+        """method to get a page of the confirmed transactions of a public key"""
+        return self.__blockchain.get_history(public_key, start, limit)
 
     def mine_block(self, status: Block.StatusHolder) -> None:
         """method to mine a block"""
@@ -111,27 +182,90 @@ class Proxy(OperationsBlockchain, OperationsP2P):
         if not self.__blockchain.mine_block(self.public_key, status):
             return
         status.NotMining()
-        self.__p2p.send_block(self.__blockchain.to_dict())
+        # published under the lock, so a state published meanwhile is not replaced by an older one
+        with self.__lock:
+            self.__p2p.send_block(self.__blockchain.state)
+
+    def has_block(self, hash: str) -> bool:
+        """method to check if a block is in the blockchain or in a side branch, not an orphan"""
+        return self.__blockchain.knows(hash)
+
+    def receive_blocks(self, blockchain: dict) -> Blockchain.Outcome:
+        """method to add received blocks of any branch, the branch with the most work is kept"""
+        with self.__lock:
+            outcome = self.__blockchain.add_blocks(blockchain["chain"], blockchain["mempool"])
+            if outcome == Blockchain.Outcome.ADOPTED:
+                self.__p2p.update_blockchain(self.__blockchain.state)
+            return outcome
+
+    def validate_chain(self, chain: list, parallel: bool = None) -> bool:
+        """method to check a received chain against the local blockchain"""
+        with self.__lock:
+            return self.__blockchain.validate_chain(chain, parallel)
+
+    def encode_blockchain(self, blockchain: dict) -> bytes:
+        """method to get the json of a blockchain made from the local one, None for another one"""
+        state = self.__blockchain.state
+        return state.to_bytes() if state.describes(blockchain) else None
 
     def update_blockchain(self, blockchain: dict) -> None:
         """method to update the blockchain"""
-        self.__blockchain.update_chain(blockchain)
+        with self.__lock:
+            if self.__blockchain.state.describes(blockchain):
+                return
+            self.__blockchain.update_chain(blockchain)
+            self.__p2p.update_blockchain(self.__blockchain.state)
 
     def create_transaction(self, sender: str, receiver: str, amount: float) -> None:
-        """method to create a transaction"""
+        """method to create a transaction, the sender must be the public key of the node"""
         if not self.validate_connection():
             return
-        transaction = self.__blockchain.create_transaction(sender, receiver, amount)
+        with self.__lock:
+            transaction = self.__blockchain.create_transaction(
+                sender, receiver, amount, self.__signing_key
+            )
+            if transaction is None:
+                return
+            self.__p2p.update_blockchain(self.__blockchain.state)
         self.__p2p.send_transaction(transaction.to_dict())
 
-    def update_transaction(self, transaction: dict) -> None:
-        """method to update the transaction"""
-        self.__blockchain.update_mempool(transaction)
+    def update_transaction(self, transaction: dict) -> bool:
+        """method to update the transaction, returns False if it was already in the mempool"""
+        with self.__lock:
+            if not self.__blockchain.update_mempool(transaction):
+                return False
+            self.__p2p.update_blockchain(self.__blockchain.state)
+            return True
 
     def balance(self, public_key: str) -> float:
         """method to get the balance of a public key"""
+        if self.__headers is not None:
+            return self.__headers.balance(public_key)
         return self.__blockchain.get_balance(public_key)
 
+    def pending_balance(self, public_key: str) -> float:
+        """method to get the balance of a public key including the pending transactions"""
+        return self.__blockchain.get_pending_balance(public_key)
+
+    def analytics(self) -> ChainAnalytics:
+        """method to get columnar views of the confirmed transactions for bulk reports"""
+        with self.__lock:
+            state = self.__blockchain.state
+            if self.__analytics is None:
+                self.__analytics = state.version, state.blocks, ChainAnalytics(state.blocks)
+            version, blocks, analytics = self.__analytics
+            if version == state.version:
+                return analytics
+            chain = state.blocks
+            # the chain grew if the last block of the reports is still at its height
+            if len(chain) >= len(blocks) and chain[len(blocks) - 1] is blocks[-1]:
+                # the returned reports are not changed, callers may still hold them
+                analytics = analytics.extended(chain[len(blocks) :])
+            else:
+                analytics = ChainAnalytics(chain)
+            self.__analytics = state.version, chain, analytics
+            return analytics
+
     def notify(self, message: dict = None) -> None:
         """method to notify the subscriber"""
         if self.__subscriber:
@@ -145,7 +279,7 @@ if __name__ == "__main__":
         input()
         proxy.get_blockchain()
         proxy.create_transaction(
-            "03d5d196ef6dbf43704d9866eaf2c3bfa952e168417ca78748967928aa066d9fe3",
+            proxy.public_key,
             "000095b871bfaa14eeb4cedf7664f5cc13803f5e87b07b1e266f5ecd57fb7e06",
             2,
         )
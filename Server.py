@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from socket import socket
+from typing import Callable, Dict, Tuple
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer
+
+# answer sent when every worker is busy and the queue is full
+SERVICE_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Retry-After: 1\r\n"
+    b"Content-Length: 0\r\n"
+    b"Connection: close\r\n\r\n"
+)
+# gzip level of the cached bodies, they are compressed once per version
+COMPRESS_LEVEL = 6
+# seconds an open connection may wait for its next request, it holds a worker meanwhile
+KEEP_ALIVE_TIMEOUT = 5
+# requests served on one connection before it is closed
+KEEP_ALIVE_REQUESTS = 100
+# longest request line, as in WSGIRequestHandler
+MAX_REQUEST_LINE = 65536
+
+
+class KeepAliveHandler(ServerHandler):
+    """class to write the answer of the app as HTTP/1.1, so the connection can be reused"""
+
+    http_version = "1.1"
+    sized = False
+
+    def close(self) -> None:
+        """method to remember if the answer had a length, before the handler forgets its headers"""
+        self.sized = self.headers is not None and "Content-Length" in self.headers
+        super().close()
+
+
+class RequestHandler(WSGIRequestHandler):
+    """class to handle the requests of a connection, giving up on clients that stop sending"""
+
+    timeout = 30
+    protocol_version = "HTTP/1.1"
+    # the head and the body of an answer are sent apart, waiting to merge them stalls the next one
+    disable_nagle_algorithm = True
+
+    def handle(self) -> None:
+        """method to serve requests while the client keeps the connection and a worker is free"""
+        for count in range(KEEP_ALIVE_REQUESTS):
+            if count:
+                self.connection.settimeout(KEEP_ALIVE_TIMEOUT)
+            self.raw_requestline = self.rfile.readline(MAX_REQUEST_LINE + 1)
+            self.connection.settimeout(self.timeout)
+            if not self.raw_requestline or not self.__handle_one():
+                return
+            if self.close_connection or not self.server.keeps_alive():
+                return
+
+    def __handle_one(self) -> bool:
+        """method to answer the request of the line just read, False if it could not be read"""
+        if len(self.raw_requestline) > MAX_REQUEST_LINE:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(414)
+            return False
+        if not self.parse_request():
+            return False
+        if "Transfer-Encoding" in self.headers:
+            # the end of a chunked body is not looked for, the connection ends with it
+            self.close_connection = True
+            body = self.rfile
+        else:
+            # the whole body is read, so what the app leaves unread is not taken for a request
+            body = io.BytesIO(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        handler = KeepAliveHandler(
+            body, self.wfile, self.get_stderr(), self.get_environ(), multithread=True
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+        # without a length the client reads the answer until the connection closes
+        if not handler.sized:
+            self.close_connection = True
+        return True
+
+
+class PooledWSGIServer(WSGIServer):
+    """class to serve the requests of a WSGI app in a bounded pool of worker threads"""
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        app,
+        workers: int = 8,
+        max_pending: int = 64,
+        timeout: float = 30,
+    ) -> None:
+        """constructor method for PooledWSGIServer class, max_pending requests wait for a worker"""
+        handler = type("RequestHandler", (RequestHandler,), {"timeout": timeout})
+        super().__init__(address, handler)
+        self.set_app(app)
+        self.__workers: int = workers
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="http"
+        )
+        self.__capacity: int = workers + max_pending
+        self.__active: int = 0
+        self.__served: int = 0
+        self.__rejected: int = 0
+        self.__closing: bool = False
+        self.__idle: threading.Condition = threading.Condition()
+
+    @property
+    def stats(self) -> dict:
+        """getter method for the served, rejected and active connections"""
+        with self.__idle:
+            return {
+                "served": self.__served,
+                "rejected": self.__rejected,
+                "active": self.__active,
+            }
+
+    def keeps_alive(self) -> bool:
+        """method to check if a connection may wait for another request, no one waits for it"""
+        with self.__idle:
+            return not self.__closing and self.__active <= self.__workers
+
+    def process_request(self, request: socket, client_address: Tuple[str, int]) -> None:
+        """method to queue a request for the workers, or reject it when the queue is full"""
+        with self.__idle:
+            accepted = not self.__closing and self.__active < self.__capacity
+            if accepted:
+                self.__active += 1
+            else:
+                self.__rejected += 1
+        if not accepted:
+            self.__reject(request)
+            return
+        self.__executor.submit(self.__handle, request, client_address)
+
+    def __reject(self, request: socket) -> None:
+        """method to answer that the server is busy and close the connection"""
+        try:
+            request.sendall(SERVICE_UNAVAILABLE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def __handle(self, request: socket, client_address: Tuple[str, int]) -> None:
+        """worker function to handle the requests of a connection and close it"""
+        try:
+            self.finish_request(request, client_address)
+        except TimeoutError:
+            pass
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self.__idle:
+                self.__active -= 1
+                self.__served += 1
+                self.__idle.notify_all()
+
+    def close(self, timeout: float = None) -> bool:
+        """method to stop taking requests and wait for the started ones, False if they timed out"""
+        with self.__idle:
+            self.__closing = True
+            finished = self.__idle.wait_for(lambda: not self.__active, timeout)
+        self.__executor.shutdown(wait=finished, cancel_futures=True)
+        self.server_close()
+        return finished
+
+
+class ResponseCache:
+    """class to keep the encoded bodies of the latest version of a document with their ETags"""
+
+    def __init__(self, level: int = COMPRESS_LEVEL) -> None:
+        """constructor method for ResponseCache class"""
+        self.__level: int = level
+        # documents are replaced, never changed, so the object identifies the version
+        self.__document: object = None
+        self.__bodies: Dict[Tuple[str, bool], Tuple[bytes, str]] = {}
+        self.__lock: threading.Lock = threading.Lock()
+        self.__hits: int = 0
+        self.__builds: int = 0
+
+    @property
+    def stats(self) -> dict:
+        """getter method for the cache hits and the encoded bodies"""
+        with self.__lock:
+            return {"hits": self.__hits, "builds": self.__builds}
+
+    def get(
+        self,
+        document: object,
+        content_type: str,
+        encoder: Callable[[object], bytes],
+        compress: bool = False,
+    ) -> Tuple[bytes, str]:
+        """method to get the body and ETag of a document, encoding it the first time"""
+        with self.__lock:
+            if document is not self.__document:
+                self.__document = document
+                self.__bodies = {}
+            cached = self.__bodies.get((content_type, compress))
+            if cached:
+                self.__hits += 1
+                return cached
+            self.__builds += 1
+            plain = self.__bodies.get((content_type, False))
+            if plain is None:
+                body = encoder(document)
+                plain = body, hashlib.blake2b(body, digest_size=16).hexdigest()
+                self.__bodies[content_type, False] = plain
+            if not compress:
+                return plain
+            # mtime 0 keeps the compressed bytes the same for the same body
+            body = gzip.compress(plain[0], compresslevel=self.__level, mtime=0)
+            cached = self.__bodies[content_type, True] = body, plain[1] + "-gzip"
+            return cached
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# cspell: disable-next-line
+from ecdsa import BadSignatureError, MalformedPointError, SECP256k1, SigningKey, VerifyingKey
+from ecdsa.util import MalformedSignature, sigdecode_string, sigencode_string
+
+# how many verified signatures are remembered
+SIGNATURE_CACHE_SIZE = 100_000
+# smaller batches are verified in the calling process
+BATCH_THRESHOLD = 64
+# how many signatures a worker verifies per task
+BATCH_CHUNK_SIZE = 32
+# a signature with s above half the order has a twin with n - s, only the lower one is accepted
+HALF_ORDER = SECP256k1.order // 2
+
+
+@lru_cache(maxsize=4096)
+def verifying_key(public_key: str) -> VerifyingKey:
+    """function to parse a compressed public key, the parsed keys are reused"""
+    return VerifyingKey.from_string(bytes.fromhex(public_key), curve=SECP256k1)
+
+
+def sign(signing_key: SigningKey, message: bytes) -> str:
+    """function to sign a message, returns the hex of the 64 byte signature"""
+    r, s = signing_key.sign_deterministic(
+        message, hashfunc=hashlib.sha256, sigencode=lambda r, s, order: (r, s)
+    )
+    return sigencode_string(r, min(s, SECP256k1.order - s), SECP256k1.order).hex()
+
+
+def verify_signature(public_key: str, signature: str, message: bytes) -> bool:
+    """function to check the signature of a message with a public key"""
+    if not signature:
+        return False
+    try:
+        raw = bytes.fromhex(signature)
+        # one spelling per signature, so a relay cannot give a transaction another id
+        if raw.hex() != signature or sigdecode_string(raw, SECP256k1.order)[1] > HALF_ORDER:
+            return False
+        return verifying_key(public_key).verify(
+            raw, message, hashfunc=hashlib.sha256, sigdecode=sigdecode_string
+        )
+    except (BadSignatureError, MalformedPointError, MalformedSignature, ValueError):
+        return False
+
+
+def verify_chunk(items: List[Tuple[str, str, bytes]]) -> List[bool]:
+    """worker function to check a list of (public key, signature, message) items"""
+    return [verify_signature(*item) for item in items]
+
+
+class SignatureVerifier:
+    """class to verify each transaction signature once, large batches in a process pool"""
+
+    # process pools by number of workers, started on the first large batch and kept
+    __pools: Dict[int, ProcessPoolExecutor] = {}
+    __pools_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, cache_size: int = SIGNATURE_CACHE_SIZE, workers: int = None) -> None:
+        """constructor method for SignatureVerifier class"""
+        self.__cache_size: int = cache_size
+        self.__workers: int = workers or os.cpu_count() or 1
+        # transaction ids with the signature that was verified for them
+        self.__verified: OrderedDict[str, str] = OrderedDict()
+        self.__lock: threading.Lock = threading.Lock()
+        self.__checked: int = 0
+        self.__hits: int = 0
+        self.__seconds: float = 0.0
+
+    @property
+    def stats(self) -> dict:
+        """getter method for the verified signatures, the cache hits and the throughput"""
+        with self.__lock:
+            return {
+                "verified": self.__checked,
+                "cache_hits": self.__hits,
+                "seconds": self.__seconds,
+                "signatures_per_second": (
+                    self.__checked / self.__seconds if self.__seconds else 0.0
+                ),
+            }
+
+    def remember(self, id: str, signature: str) -> None:
+        """method to remember that the signature of a transaction is valid"""
+        with self.__lock:
+            self.__verified[id] = signature
+            self.__verified.move_to_end(id)
+            if len(self.__verified) > self.__cache_size:
+                self.__verified.popitem(last=False)
+
+    def __verify_items(self, items: List[Tuple[str, str, bytes]]) -> List[bool]:
+        """method to check signatures, in worker processes when there are many"""
+        if len(items) < BATCH_THRESHOLD or self.__workers == 1:
+            return verify_chunk(items)
+        chunks = [items[i : i + BATCH_CHUNK_SIZE] for i in range(0, len(items), BATCH_CHUNK_SIZE)]
+        executor = self.__pool()
+        try:
+            return [result for chunk in executor.map(verify_chunk, chunks) for result in chunk]
+        except BrokenProcessPool:
+            # a worker died, the next batch starts a new pool and this one is checked here
+            with SignatureVerifier.__pools_lock:
+                if SignatureVerifier.__pools.get(self.__workers) is executor:
+                    del SignatureVerifier.__pools[self.__workers]
+            return verify_chunk(items)
+
+    def __pool(self) -> ProcessPoolExecutor:
+        """method to get the process pool of the workers, it is started on first use"""
+        with SignatureVerifier.__pools_lock:
+            if self.__workers not in SignatureVerifier.__pools:
+                SignatureVerifier.__pools[self.__workers] = ProcessPoolExecutor(self.__workers)
+            return SignatureVerifier.__pools[self.__workers]
+
+    def verify_each(self, transactions: Sequence) -> List[bool]:
+        """method to check the signature of each user transaction, skipping the known ones"""
+        results = [False] * len(transactions)
+        pending = []
+        with self.__lock:
+            for i, transaction in enumerate(transactions):
+                signature = transaction.signature
+                if signature and self.__verified.get(transaction.id) == signature:
+                    results[i] = True
+                    self.__hits += 1
+                else:
+                    pending.append(i)
+        if not pending:
+            return results
+        items = [
+            (
+                transactions[i].sender,
+                transactions[i].signature,
+                transactions[i].message(),
+            )
+            for i in pending
+        ]
+        start = time.perf_counter()
+        checked = self.__verify_items(items)
+        elapsed = time.perf_counter() - start
+        for i, valid in zip(pending, checked):
+            results[i] = valid
+            if valid:
+                self.remember(transactions[i].id, transactions[i].signature)
+        with self.__lock:
+            self.__checked += len(items)
+            self.__seconds += elapsed
+        return results
+
+    def verify(self, transactions: Sequence) -> bool:
+        """method to check that every user transaction has a valid signature"""
+        return all(self.verify_each(transactions))
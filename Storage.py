@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from typing import Dict, Iterator, Optional
+
+from Wire import Wire
+
+# hash, offset and length of a block in the segment file
+INDEX_ENTRY = struct.Struct(">32sQI")
+SNAPSHOT_VERSION = 1
+
+
+class BlockStore:
+    """class to keep the blocks of the chain in an append-only file with an offset index"""
+
+    class Format(Enum):
+        """enumeration for the formats of the stored blocks"""
+
+        JSON = b"\x00"
+        WIRE = b"\x01"
+
+    def __init__(self, directory: str) -> None:
+        """constructor method for BlockStore class"""
+        os.makedirs(directory, exist_ok=True)
+        self.__lock: threading.Lock = threading.Lock()
+        self.__segment = open(os.path.join(directory, "blocks.dat"), "a+b")
+        self.__index = open(os.path.join(directory, "blocks.idx"), "a+b")
+        self.__map: mmap.mmap = None
+        self.__hashes: Dict[str, int] = None
+        self.__recover()
+
+    def __recover(self) -> None:
+        """method to drop the index entries of a write that did not finish"""
+        size = os.fstat(self.__segment.fileno()).st_size
+        length = os.fstat(self.__index.fileno()).st_size // INDEX_ENTRY.size
+        while length:
+            self.__index.seek((length - 1) * INDEX_ENTRY.size)
+            _, offset, record = INDEX_ENTRY.unpack(self.__index.read(INDEX_ENTRY.size))
+            if offset + record <= size:
+                break
+            length -= 1
+        self.__index.truncate(length * INDEX_ENTRY.size)
+
+    def __len__(self) -> int:
+        """method to return the number of stored blocks"""
+        return os.fstat(self.__index.fileno()).st_size // INDEX_ENTRY.size
+
+    def __entry(self, height: int) -> tuple:
+        """method to read the index entry of a height"""
+        self.__index.seek(height * INDEX_ENTRY.size)
+        return INDEX_ENTRY.unpack(self.__index.read(INDEX_ENTRY.size))
+
+    def __view(self, end: int) -> mmap.mmap:
+        """method to map the segment file, mapping it again when it has grown past end"""
+        if self.__map is None or len(self.__map) < end:
+            if self.__map is not None:
+                self.__map.close()
+            self.__map = mmap.mmap(self.__segment.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__map
+
+    def height(self, hash: str) -> int:
+        """method to get the height of a stored block, -1 if it is not stored"""
+        with self.__lock:
+            if self.__hashes is None:
+                self.__index.seek(0)
+                entries = self.__index.read()
+                self.__hashes = {
+                    entry[0].hex(): height
+                    for height, entry in enumerate(INDEX_ENTRY.iter_unpack(entries))
+                }
+            return self.__hashes.get(hash, -1)
+
+    def read(self, height: int) -> dict:
+        """method to read the block stored at a height"""
+        with self.__lock:
+            _, offset, length = self.__entry(height)
+            record = self.__view(offset + length)[offset : offset + length]
+        if record[:1] == BlockStore.Format.WIRE.value:
+            return Wire.decode(record[1:])
+        return json.loads(record[1:])
+
+    def __iter__(self) -> Iterator[dict]:
+        """method to read the stored blocks in order"""
+        for height in range(len(self)):
+            yield self.read(height)
+
+    def append(self, block: dict) -> None:
+        """method to store a block after the last one"""
+        try:
+            record = BlockStore.Format.WIRE.value + Wire.encode(block)
+        except ValueError:
+            record = BlockStore.Format.JSON.value + json.dumps(block).encode()
+        with self.__lock:
+            self.__segment.seek(0, os.SEEK_END)
+            offset = self.__segment.tell()
+            self.__segment.write(record)
+            self.__segment.flush()
+            # the index entry is written last so a crash never indexes a partial block
+            height = len(self)
+            self.__index.write(INDEX_ENTRY.pack(bytes.fromhex(block["hash"]), offset, len(record)))
+            self.__index.flush()
+            if self.__hashes is not None:
+                self.__hashes[block["hash"]] = height
+
+    def truncate(self, length: int) -> None:
+        """method to forget the blocks from a height on, their bytes stay in the segment file"""
+        with self.__lock:
+            if self.__hashes is not None:
+                for height in range(length, len(self)):
+                    self.__hashes.pop(self.__entry(height)[0].hex(), None)
+            self.__index.truncate(length * INDEX_ENTRY.size)
+
+    def close(self) -> None:
+        """method to close the files of the store"""
+        with self.__lock:
+            if self.__map is not None:
+                self.__map.close()
+            self.__segment.close()
+            self.__index.close()
+
+
+class SnapshotStore:
+    """class to keep the latest snapshot of the blockchain state in a compressed file"""
+
+    def __init__(self, directory: str) -> None:
+        """constructor method for SnapshotStore class"""
+        os.makedirs(directory, exist_ok=True)
+        self.__path: str = os.path.join(directory, "snapshot.dat")
+        # a single writer keeps the snapshots in order and off the caller's thread
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1)
+
+    def load(self) -> Optional[dict]:
+        """method to read the latest snapshot, None if there is none or it is damaged"""
+        try:
+            with open(self.__path, "rb") as file:
+                snapshot = json.loads(zlib.decompress(file.read()))
+        except (OSError, zlib.error, ValueError):
+            return None
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+
+    def __write(self, snapshot: dict) -> None:
+        """method to write a snapshot next to the old one and then replace it"""
+        data = json.dumps({"version": SNAPSHOT_VERSION, **snapshot}, separators=(",", ":"))
+        temporary = self.__path + ".tmp"
+        with open(temporary, "wb") as file:
+            file.write(zlib.compress(data.encode()))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.__path)
+
+    def save(self, snapshot: dict) -> Future:
+        """method to write a snapshot in the background"""
+        return self.__executor.submit(self.__write, snapshot)
+
+    def close(self) -> None:
+        """method to wait for the queued snapshots to be written"""
+        self.__executor.shutdown(wait=True)
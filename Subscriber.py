@@ -10,12 +10,22 @@ from Proxy import Proxy, Subscriber
 class User(Subscriber):
     """class to create a user"""
 
-    def __init__(self, private_key: str, port=80) -> None:
-        """constructor of the class"""
-        self.__proxy: Proxy = Proxy(private_key, port, self, UsersType.USER)
+    def __init__(
+        self, private_key: str, port=80, data_dir: str = None, light: bool = False
+    ) -> None:
+        """constructor of the class, light users keep only the block headers"""
+        self.__proxy: Proxy = Proxy(private_key, port, self, UsersType.USER, data_dir, light)
         self.__public_key: str = self.__proxy.public_key
+        self.__light: bool = light
         self.__proxy.connect()
-        self.__proxy.get_blockchain()
+        self.sync()
+
+    def sync(self) -> None:
+        """method to get the blockchain, or only the headers and own proofs if light"""
+        if self.__light:
+            self.__proxy.sync_headers()
+        else:
+            self.__proxy.get_blockchain()
 
     @property
     def public_key(self) -> str:
@@ -29,6 +39,8 @@ class User(Subscriber):
 
     def get_balance(self) -> float:
         """method to get the balance"""
+        if self.__light:
+            self.__proxy.sync_headers()
         return self.__proxy.balance(self.public_key)
 
     def send_transaction(self, receiver: str, amount: float) -> None:
@@ -45,9 +57,9 @@ class User(Subscriber):
 
 
 class Miner(Subscriber):
-    def __init__(self, private_key: str, port=80) -> None:
+    def __init__(self, private_key: str, port=80, data_dir: str = None) -> None:
         """constructor of the class"""
-        self.__proxy: Proxy = Proxy(private_key, port, self, UsersType.MINER)
+        self.__proxy: Proxy = Proxy(private_key, port, self, UsersType.MINER, data_dir)
         self.__mining_status: Block.StatusHolder = Block.StatusHolder()
         self.__public_key: str = self.__proxy.public_key
         self.__proxy.connect()
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import datetime
+import struct
+from enum import Enum
+from typing import List, Tuple
+
+from Blockchain import AMOUNT_SCALE, EPOCH, format_timestamp
+
+CONTENT_TYPE = "application/x-itcoin"
+JSON_CONTENT_TYPE = "application/json"
+MAGIC = b"ITC"
+WIRE_VERSION = 1
+COINBASE = "ITcoin"
+# r and s of a secp256k1 signature
+SIGNATURE_SIZE = 64
+
+
+class Wire:
+    """class to encode blocks, transactions and blockchains in a compact binary format"""
+
+    class Kind(Enum):
+        """enumeration for message kinds"""
+
+        TRANSACTION = 0
+        BLOCK = 1
+        BLOCKCHAIN = 2
+
+    # flags of a transaction
+    CONFIRMED = 1
+    HAS_TIMESTAMP = 2
+    MINER = 4
+    HAS_SIGNATURE = 8
+    # flags of a block
+    HAS_PREVIOUS = 1
+    HAS_MERKLE_ROOT = 2
+    # tags of a key
+    COMPRESSED_KEY = 0
+    TEXT_KEY = 1
+
+    HEADER = struct.Struct(">3sBB")
+    TRANSACTION = struct.Struct(">Bqq")
+    BLOCK = struct.Struct(">IBq32s32sIQ32sI")
+    COUNT = struct.Struct(">I")
+
+    @staticmethod
+    def accepts(header: str) -> bool:
+        """method to check if an Accept or Content-Type header asks for the binary format"""
+        return CONTENT_TYPE in (header or "")
+
+    @staticmethod
+    def __timestamp_to_int(timestamp: str) -> int:
+        """method to convert a timestamp string to microseconds since the epoch"""
+        delta = datetime.datetime.fromisoformat(timestamp) - EPOCH
+        return delta // datetime.timedelta(microseconds=1)
+
+    @staticmethod
+    def __encode_key(key: str, out: List[bytes]) -> None:
+        """method to encode a public key, 33 raw bytes when it is a compressed key"""
+        if len(key) == 66 and key == key.lower():
+            try:
+                out.append(bytes([Wire.COMPRESSED_KEY]) + bytes.fromhex(key))
+                return
+            except ValueError:
+                pass
+        key = key.encode()
+        out.append(struct.pack(">BH", Wire.TEXT_KEY, len(key)) + key)
+
+    @staticmethod
+    def __decode_key(data: memoryview, offset: int) -> Tuple[str, int]:
+        """method to decode a public key"""
+        if data[offset] == Wire.COMPRESSED_KEY:
+            return data[offset + 1 : offset + 34].hex(), offset + 34
+        (length,) = struct.unpack_from(">H", data, offset + 1)
+        offset += 3
+        return bytes(data[offset : offset + length]).decode(), offset + length
+
+    @staticmethod
+    def __encode_transaction(transaction: dict, out: List[bytes]) -> None:
+        """method to encode a transaction"""
+        miner = transaction["sender"] == COINBASE
+        flags = (
+            (Wire.CONFIRMED if transaction["status"] == "CONFIRMED" else 0)
+            | (Wire.HAS_TIMESTAMP if transaction.get("timestamp") else 0)
+            | (Wire.MINER if miner else 0)
+            | (Wire.HAS_SIGNATURE if transaction.get("signature") else 0)
+        )
+        timestamp = transaction.get("timestamp")
+        amount = round(transaction["amount"] * AMOUNT_SCALE)
+        if amount / AMOUNT_SCALE != transaction["amount"]:
+            raise ValueError("the amount has more decimals than the binary format")
+        out.append(
+            Wire.TRANSACTION.pack(
+                flags,
+                amount,
+                Wire.__timestamp_to_int(timestamp) if timestamp else 0,
+            )
+        )
+        if not miner:
+            Wire.__encode_key(transaction["sender"], out)
+        Wire.__encode_key(transaction["receiver"], out)
+        if transaction.get("signature"):
+            signature = bytes.fromhex(transaction["signature"])
+            if len(signature) != SIGNATURE_SIZE:
+                raise ValueError("the signature does not fit the binary format")
+            out.append(signature)
+
+    @staticmethod
+    def __decode_transaction(data: memoryview, offset: int) -> Tuple[dict, int]:
+        """method to decode a transaction"""
+        flags, amount, timestamp = Wire.TRANSACTION.unpack_from(data, offset)
+        offset += Wire.TRANSACTION.size
+        sender = COINBASE
+        if not flags & Wire.MINER:
+            sender, offset = Wire.__decode_key(data, offset)
+        receiver, offset = Wire.__decode_key(data, offset)
+        transaction = {
+            "amount": amount / AMOUNT_SCALE,
+            "sender": sender,
+            "receiver": receiver,
+            "status": "CONFIRMED" if flags & Wire.CONFIRMED else "PENDING",
+            "timestamp": (format_timestamp(timestamp) if flags & Wire.HAS_TIMESTAMP else None),
+        }
+        if not flags & Wire.MINER:
+            signature = None
+            if flags & Wire.HAS_SIGNATURE:
+                signature = data[offset : offset + SIGNATURE_SIZE].hex()
+                offset += SIGNATURE_SIZE
+            transaction["signature"] = signature
+        return transaction, offset
+
+    @staticmethod
+    def __encode_transactions(transactions: List[dict], out: List[bytes]) -> None:
+        """method to encode a list of transactions"""
+        out.append(Wire.COUNT.pack(len(transactions)))
+        for transaction in transactions:
+            Wire.__encode_transaction(transaction, out)
+
+    @staticmethod
+    def __decode_transactions(data: memoryview, offset: int) -> Tuple[List[dict], int]:
+        """method to decode a list of transactions"""
+        (count,) = Wire.COUNT.unpack_from(data, offset)
+        offset += Wire.COUNT.size
+        transactions = []
+        for _ in range(count):
+            transaction, offset = Wire.__decode_transaction(data, offset)
+            transactions.append(transaction)
+        return transactions, offset
+
+    @staticmethod
+    def __encode_block(block: dict, out: List[bytes]) -> None:
+        """method to encode a block"""
+        if block.get("version", 1) < 2:
+            # version 1 hashes depend on the exact text of the amounts
+            raise ValueError("version 1 blocks can only be sent as json")
+        flags = (Wire.HAS_PREVIOUS if block["previous_block"] else 0) | (
+            Wire.HAS_MERKLE_ROOT if block["merkle_root"] else 0
+        )
+        out.append(
+            Wire.BLOCK.pack(
+                block["version"],
+                flags,
+                Wire.__timestamp_to_int(block["timestamp"]),
+                bytes.fromhex(block["previous_block"]) if block["previous_block"] else bytes(32),
+                bytes.fromhex(block["merkle_root"]) if block["merkle_root"] else bytes(32),
+                block["difficulty"],
+                block["magic_number"],
+                bytes.fromhex(block["hash"]),
+                len(block["transactions"]),
+            )
+        )
+        for transaction in block["transactions"]:
+            Wire.__encode_transaction(transaction, out)
+
+    @staticmethod
+    def __decode_block(data: memoryview, offset: int) -> Tuple[dict, int]:
+        """method to decode a block"""
+        (
+            version,
+            flags,
+            timestamp,
+            previous_block,
+            merkle_root,
+            difficulty,
+            magic_number,
+            hash,
+            count,
+        ) = Wire.BLOCK.unpack_from(data, offset)
+        offset += Wire.BLOCK.size
+        transactions = []
+        for _ in range(count):
+            transaction, offset = Wire.__decode_transaction(data, offset)
+            transactions.append(transaction)
+        block = {
+            "version": version,
+            "timestamp": format_timestamp(timestamp),
+            "transactions": transactions,
+            "previous_block": previous_block.hex() if flags & Wire.HAS_PREVIOUS else None,
+            "merkle_root": merkle_root.hex() if flags & Wire.HAS_MERKLE_ROOT else None,
+            "difficulty": difficulty,
+            "magic_number": magic_number,
+            "hash": hash.hex(),
+        }
+        return block, offset
+
+    @staticmethod
+    def encode(data: dict) -> bytes:
+        """method to encode a transaction, block or blockchain dictionary"""
+        out: List[bytes] = []
+        if "chain" in data:
+            out.append(Wire.HEADER.pack(MAGIC, WIRE_VERSION, Wire.Kind.BLOCKCHAIN.value))
+            out.append(Wire.COUNT.pack(data["length"]))
+            out.append(Wire.COUNT.pack(len(data["chain"])))
+            for block in data["chain"]:
+                Wire.__encode_block(block, out)
+            Wire.__encode_transactions(data["mempool"], out)
+        elif "magic_number" in data:
+            out.append(Wire.HEADER.pack(MAGIC, WIRE_VERSION, Wire.Kind.BLOCK.value))
+            Wire.__encode_block(data, out)
+        elif "sender" in data:
+            out.append(Wire.HEADER.pack(MAGIC, WIRE_VERSION, Wire.Kind.TRANSACTION.value))
+            Wire.__encode_transaction(data, out)
+        else:
+            raise ValueError("unknown message")
+        return b"".join(out)
+
+    @staticmethod
+    def decode(payload: bytes) -> dict:
+        """method to decode a transaction, block or blockchain dictionary"""
+        data = memoryview(payload)
+        magic, version, kind = Wire.HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != WIRE_VERSION:
+            raise ValueError("unsupported message")
+        offset = Wire.HEADER.size
+        if kind == Wire.Kind.TRANSACTION.value:
+            return Wire.__decode_transaction(data, offset)[0]
+        if kind == Wire.Kind.BLOCK.value:
+            return Wire.__decode_block(data, offset)[0]
+        if kind != Wire.Kind.BLOCKCHAIN.value:
+            raise ValueError("unknown message")
+        (length,) = Wire.COUNT.unpack_from(data, offset)
+        (count,) = Wire.COUNT.unpack_from(data, offset + Wire.COUNT.size)
+        offset += 2 * Wire.COUNT.size
+        chain = []
+        for _ in range(count):
+            block, offset = Wire.__decode_block(data, offset)
+            chain.append(block)
+        mempool, offset = Wire.__decode_transactions(data, offset)
+        return {"chain": chain, "length": length, "mempool": mempool}
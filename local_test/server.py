@@ -5,11 +5,14 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from Proxy import Proxy
 
-try:
-    proxy = Proxy("server")
-    proxy.run()
-    print("press ctrl+c to stop")
-    while True:
-        pass
-except KeyboardInterrupt:
-    proxy.stop()
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+if __name__ == "__main__":
+    try:
+        proxy = Proxy("server", data_dir=str(DATA_DIR / "80"))
+        proxy.run()
+        print("press ctrl+c to stop")
+        while True:
+            pass
+    except KeyboardInterrupt:
+        proxy.stop()
@@ -5,26 +5,29 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from Subscriber import User
 
-private_key = input("private key: ")
+DATA_DIR = Path(__file__).resolve().parent / "data"
 
-try:
-    user = User(private_key, 5000)
-    while True:
-        decision = input(
-            "What do you want to do?\n 1. Print blockchain\n 2. Create transaction\n 3. Get balance\n 4. get public key\n 5. exit\n"
-        )
-        if decision == "1":
-            print(user.blockchain)
-        elif decision == "2":
-            receiver = input("Receiver: ")
-            amount = float(input("Amount: "))
-            user.send_transaction(receiver, amount)
-        elif decision == "3":
-            print(user.get_balance())
-        elif decision == "4":
-            print(user.public_key)
-        elif decision == "5":
-            user.stop_connection()
-            break
-except KeyboardInterrupt:
-    user.stop_connection()
+if __name__ == "__main__":
+    private_key = input("private key: ")
+
+    try:
+        user = User(private_key, 5000, str(DATA_DIR / "5000"))
+        while True:
+            decision = input(
+                "What do you want to do?\n 1. Print blockchain\n 2. Create transaction\n 3. Get balance\n 4. get public key\n 5. exit\n"
+            )
+            if decision == "1":
+                print(user.blockchain)
+            elif decision == "2":
+                receiver = input("Receiver: ")
+                amount = float(input("Amount: "))
+                user.send_transaction(receiver, amount)
+            elif decision == "3":
+                print(user.get_balance())
+            elif decision == "4":
+                print(user.public_key)
+            elif decision == "5":
+                user.stop_connection()
+                break
+    except KeyboardInterrupt:
+        user.stop_connection()